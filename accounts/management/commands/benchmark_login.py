@@ -0,0 +1,81 @@
+import time
+
+from django.contrib.auth import login
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+from django.db.models.signals import post_save
+from django.test import RequestFactory
+
+from accounts.models import UserProfile
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+def legacy_save_user_profile(sender, instance, **kwargs):
+    """The receiver profiles used to have: a full profile save on every User save"""
+    if hasattr(instance, 'userprofile'):
+        models.Model.save(instance.userprofile)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure login throughput and database writes per login, now and with '
+        'the old save-profile-on-every-User-save receiver connected. Users and '
+        'sessions are created in a transaction that is rolled back; password '
+        'hashing is left out so the database work is what gets measured.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=500, help='Logins per run (default 500)')
+        parser.add_argument('--users', type=int, default=50, help='Distinct users logging in (default 50)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            password = make_password(None)
+            users = User.objects.bulk_create([
+                User(username=f'benchmark-login-{i}', password=password) for i in range(options['users'])
+            ])
+            UserProfile.objects.bulk_create([UserProfile(user=user) for user in users])
+            user_ids = [user.pk for user in users]
+
+            self.stdout.write(f'{"":<16} {"logins/s":>10} {"queries":>8} {"writes":>8}')
+            self.report('current', options['logins'], self.run(user_ids, options['logins']))
+            post_save.connect(legacy_save_user_profile, sender=User)
+            try:
+                self.report('legacy receiver', options['logins'], self.run(user_ids, options['logins']))
+            finally:
+                post_save.disconnect(legacy_save_user_profile, sender=User)
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS('Done.'))
+
+    def run(self, user_ids, logins):
+        """Log users in the way ``LoginView`` does; returns (seconds, queries, writes)"""
+        factory = RequestFactory()
+        sessions = SessionMiddleware(lambda request: None)
+        counts = {'queries': 0, 'writes': 0}
+
+        def count(execute, sql, params, many, context):
+            counts['queries'] += 1
+            if sql.lstrip().upper().startswith(WRITE_STATEMENTS):
+                counts['writes'] += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(count):
+            for i in range(logins):
+                request = factory.post('/accounts/login/')
+                sessions.process_request(request)
+                # A fresh instance per login, as authentication would load
+                user = User.objects.get(pk=user_ids[i % len(user_ids)])
+                login(request, user, backend='django.contrib.auth.backends.ModelBackend')
+                request.session.save()
+        return time.perf_counter() - started, counts['queries'], counts['writes']
+
+    def report(self, name, logins, result):
+        elapsed, queries, writes = result
+        self.stdout.write(
+            f'{name:<16} {logins / elapsed:>10.0f} {queries / logins:>8.1f} {writes / logins:>8.1f}'
+        )
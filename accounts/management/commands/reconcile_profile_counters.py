@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from accounts.models import UserProfile
+from tourism.models import Review, Trip, Wishlist
+
+# Stored counter -> model counted per user
+COUNTERS = {
+    'review_count': Review,
+    'wishlist_count': Wishlist,
+    'trip_count': Trip,
+}
+
+
+def actual_count(model):
+    """Per-profile subquery counting ``model`` rows of the profile's user"""
+    return Coalesce(Subquery(
+        model.objects.filter(user_id=OuterRef('user_id')).order_by().values('user_id')
+        .annotate(total=Count('pk')).values('total'),
+        output_field=IntegerField(),
+    ), Value(0))
+
+
+class Command(BaseCommand):
+    help = (
+        'Recount reviews, wishlist items and trips for every user profile and '
+        'fix stored counters that drifted, in one UPDATE per batch'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Profiles per UPDATE (default 5000)')
+
+    def handle(self, *args, **options):
+        drift = Q()
+        for field in COUNTERS:
+            drift |= ~Q(**{field: F(f'actual_{field}')})
+        drifted = list(UserProfile.objects.annotate(**{
+            f'actual_{field}': actual_count(model) for field, model in COUNTERS.items()
+        }).filter(drift).values_list('pk', flat=True))
+
+        if options['dry_run']:
+            self.stdout.write(f'{len(drifted)} profiles have drifted counters.')
+            return
+
+        batch_size = options['batch_size']
+        for start in range(0, len(drifted), batch_size):
+            UserProfile.objects.filter(pk__in=drifted[start:start + batch_size]).update(**{
+                field: actual_count(model) for field, model in COUNTERS.items()
+            })
+        self.stdout.write(self.style.SUCCESS(f'Fixed counters of {len(drifted)} profiles.'))
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-19 02:10
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_for_user(model):
+    return Coalesce(Subquery(
+        model.objects.filter(user_id=OuterRef('user_id')).order_by().values('user_id')
+        .annotate(total=Count('pk')).values('total'),
+        output_field=IntegerField(),
+    ), Value(0))
+
+
+def backfill_counters(apps, schema_editor):
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    UserProfile.objects.update(
+        review_count=count_for_user(apps.get_model('tourism', 'Review')),
+        wishlist_count=count_for_user(apps.get_model('tourism', 'Wishlist')),
+        trip_count=count_for_user(apps.get_model('tourism', 'Trip')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('tourism', '0002_placeweathercache_trip_tripdestination'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='trip_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='wishlist_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,38 @@
+import copy
+
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.fields.files import FieldFile
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+
+
+def _snapshot(value):
+    """A copy of a field value that later in-place edits can't change"""
+    if isinstance(value, FieldFile):
+        return value.name
+    if isinstance(value, (dict, list)):
+        return copy.deepcopy(value)
+    return value
+
+
+class UserProfileManager(models.Manager):
+    def for_user(self, user):
+        """
+        The user's profile, created on first access. Profiles aren't made
+        when users are, so counters start from the user's current activity.
+        """
+        try:
+            return user.userprofile
+        except UserProfile.DoesNotExist:
+            pass
+        profile, _ = self.get_or_create(user=user, defaults={
+            'review_count': user.review_set.count(),
+            'wishlist_count': user.wishlist_set.count(),
+            'trip_count': user.trip_set.count(),
+        })
+        user.userprofile = profile
+        return profile
 
 
 class UserProfile(models.Model):
@@ -33,10 +64,53 @@ class UserProfile(models.Model):
     show_email = models.BooleanField(default=False)
     show_phone = models.BooleanField(default=False)
     
+    # Activity counters, kept up to date by tourism.signals; the
+    # reconcile_profile_counters command repairs any drift
+    review_count = models.PositiveIntegerField(default=0)
+    wishlist_count = models.PositiveIntegerField(default=0)
+    trip_count = models.PositiveIntegerField(default=0)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = UserProfileManager()
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded_values()
+        return instance
+    
+    def _remember_loaded_values(self):
+        self._loaded_values = {
+            field.attname: _snapshot(self.__dict__[field.attname])
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+    
+    def get_dirty_fields(self):
+        """Names of loaded fields changed since the row was read or saved"""
+        loaded = getattr(self, '_loaded_values', {})
+        return [
+            field.attname for field in self._meta.concrete_fields
+            if field.attname in loaded and getattr(self, field.attname) != loaded[field.attname]
+        ]
+    
+    def save(self, *args, **kwargs):
+        """
+        Write only changed fields of an existing profile, and nothing at all
+        when none changed. Counters move through ``adjust_counters``, so an
+        unrelated save never overwrites them with stale values.
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None and hasattr(self, '_loaded_values'):
+            dirty = self.get_dirty_fields()
+            if not dirty:
+                return
+            kwargs['update_fields'] = [*dirty, 'updated_at']
+        super().save(*args, **kwargs)
+        self._remember_loaded_values()
+    
     def __str__(self):
         return f"{self.user.username}'s Profile"
     
@@ -44,21 +118,17 @@ class UserProfile(models.Model):
         return f"{self.user.first_name} {self.user.last_name}".strip()
     
     def get_review_count(self):
-        return self.user.review_set.count()
+        return self.review_count
     
     def get_wishlist_count(self):
-        return self.user.wishlist_set.count()
-
-
-@receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
-    """Create UserProfile when User is created"""
-    if created:
-        UserProfile.objects.create(user=instance)
-
-
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    """Save UserProfile when User is saved"""
-    if hasattr(instance, 'userprofile'):
-        instance.userprofile.save()
+        return self.wishlist_count
+    
+    def get_trip_count(self):
+        return self.trip_count
+    
+    @classmethod
+    def adjust_counters(cls, user_id, **deltas):
+        """Atomically add ``deltas`` to a user's stored counters, never going below zero"""
+        cls.objects.filter(user_id=user_id).update(**{
+            field: Greatest(F(field) + delta, Value(0)) for field, delta in deltas.items()
+        })
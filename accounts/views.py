@@ -57,10 +57,7 @@ class SignUpView(CreateView):
 @login_required
 def profile_view(request):
     """User profile view"""
-    try:
-        profile = request.user.userprofile
-    except UserProfile.DoesNotExist:
-        profile = UserProfile.objects.create(user=request.user)
+    profile = UserProfile.objects.for_user(request.user)
     
     context = {
         'title': 'My Profile',
@@ -73,10 +70,7 @@ def profile_view(request):
 @login_required
 def edit_profile_view(request):
     """Edit user profile view"""
-    try:
-        profile = request.user.userprofile
-    except UserProfile.DoesNotExist:
-        profile = UserProfile.objects.create(user=request.user)
+    profile = UserProfile.objects.for_user(request.user)
     
     if request.method == 'POST':
         user_form = UserUpdateForm(request.POST, instance=request.user)
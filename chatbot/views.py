@@ -5,13 +5,15 @@ from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
+from django.db.models import Count, Max
 import json
 import uuid
 import re
 from datetime import datetime
 
 from .models import ChatSession, ChatMessage, ChatFeedback
-from tourism.models import Destination, Category, State
+from tourism.catalogue import catalogue
+from tourism.conditional import conditional_json, memoize_on_request
 
 
 class ChatView(TemplateView):
@@ -100,6 +102,28 @@ def voice_to_text(request):
     })
 
 
+@memoize_on_request
+def _chat_history_state(request):
+    """Message count, last message ID and time for the requested session"""
+    session_id = request.GET.get('session_id')
+    if not session_id:
+        return None
+    return ChatSession.objects.filter(session_id=session_id).annotate(
+        count=Count('messages'), last_id=Max('messages__id'), last_at=Max('messages__created_at')
+    ).values('count', 'last_id', 'last_at').first()
+
+
+def _chat_history_version(request):
+    state = _chat_history_state(request)
+    return state and f"{state['count']}|{state['last_id']}"
+
+
+def _chat_history_last_modified(request):
+    state = _chat_history_state(request)
+    return state and state['last_at']
+
+
+@conditional_json(_chat_history_version, _chat_history_last_modified, private=True, no_cache=True)
 def get_chat_history(request):
     """Retrieve chat history for a session"""
     session_id = request.GET.get('session_id')
@@ -203,13 +227,12 @@ def generate_ai_response(user_message):
 
 def get_destination_response(user_message):
     """Generate response for destination queries"""
-    # Try to find specific destinations mentioned
-    destinations = Destination.objects.filter(is_active=True)
+    snapshot = catalogue.snapshot()
     
     # Check for specific destination names
-    for destination in destinations[:20]:  # Limit to avoid performance issues
-        if destination.name.lower() in user_message or destination.city.lower() in user_message:
-            return f"""✈️ **{destination.name}** is a {', '.join([cat.get_name_display() for cat in destination.categories.all()])} destination in {destination.state.name}!
+    for destination in snapshot.destinations:
+        if destination.name_lower in user_message or destination.city_lower in user_message:
+            return f"""✈️ **{destination.name}** is a {', '.join([cat.get_name_display() for cat in destination.categories])} destination in {destination.state.name}!
 
 📍 **Location**: {destination.city}, {destination.state.name}
 ⭐ **Rating**: {destination.average_rating}/5.0 ({destination.total_reviews} reviews)
@@ -222,12 +245,11 @@ def get_destination_response(user_message):
 Would you like to know more about the local culture, food, or how to reach there?"""
     
     # Check for categories
-    categories = Category.objects.all()
-    for category in categories:
+    for category in snapshot.categories:
         category_display = category.get_name_display().lower()
         if category_display in user_message or category.name in user_message:
-            destinations_count = category.destinations.filter(is_active=True).count()
-            sample_destinations = category.destinations.filter(is_active=True)[:3]
+            destinations_count = category.destination_count
+            sample_destinations = snapshot.by_category.get(category.name, ())[:3]
             
             response = f"🌟 **{category.get_name_display()}** destinations in India:\n\n"
             response += f"We have {destinations_count} amazing {category_display} destinations! Here are some highlights:\n\n"
@@ -239,11 +261,10 @@ Would you like to know more about the local culture, food, or how to reach there
             return response
     
     # Check for states
-    states = State.objects.filter(destination__is_active=True).distinct()
-    for state in states:
-        if state.name.lower() in user_message:
-            destinations_count = state.destination_set.filter(is_active=True).count()
-            sample_destinations = state.destination_set.filter(is_active=True)[:3]
+    for state in snapshot.states:
+        if state.destination_count and state.name.lower() in user_message:
+            destinations_count = state.destination_count
+            sample_destinations = snapshot.by_state[state.name][:3]
             
             response = f"🏛️ **{state.name}** has {destinations_count} wonderful destinations:\n\n"
             
@@ -351,21 +372,20 @@ def extract_destination_entities(user_message):
         'states': [],
     }
     
+    snapshot = catalogue.snapshot()
+    
     # Extract destination names
-    destinations = Destination.objects.filter(is_active=True)
-    for dest in destinations:
-        if dest.name.lower() in user_message:
+    for dest in snapshot.destinations:
+        if dest.name_lower in user_message:
             entities['destinations'].append(dest.name)
     
     # Extract categories
-    categories = Category.objects.all()
-    for cat in categories:
+    for cat in snapshot.categories:
         if cat.name in user_message or cat.get_name_display().lower() in user_message:
             entities['categories'].append(cat.name)
     
     # Extract states
-    states = State.objects.all()
-    for state in states:
+    for state in snapshot.states:
         if state.name.lower() in user_message:
             entities['states'].append(state.name)
     
@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "smart_tourism_platform.settings")
 
 application = get_asgi_application()
+
+from tourism.warmup import warm_caches  # noqa: E402
+
+warm_caches()
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "smart_tourism_platform.settings")
 
 application = get_wsgi_application()
+
+from tourism.warmup import warm_caches  # noqa: E402
+
+warm_caches()
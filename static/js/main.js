@@ -123,7 +123,7 @@ document.addEventListener('DOMContentLoaded', function() {
         icon.className = 'fas fa-spinner fa-spin';
         button.disabled = true;
         
-        fetch('/toggle_wishlist/', {
+        fetch('/api/wishlist/toggle/', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -160,6 +160,19 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     };
     
+    // Report a browser-side analytics event; never blocks or surfaces errors
+    window.trackEvent = function(kind, data) {
+        fetch('/api/events/', {
+            method: 'POST',
+            keepalive: true,
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': getCookie('csrftoken')
+            },
+            body: JSON.stringify(Object.assign({kind: kind}, data))
+        }).catch(() => {});
+    };
+    
     // Utility function to get CSRF token
     function getCookie(name) {
         let cookieValue = null;
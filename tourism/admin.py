@@ -3,9 +3,13 @@ from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 from django.contrib import messages
-from django.core.files.base import ContentFile
-import requests
-from .models import Category, State, Destination, Review, Wishlist
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count
+from django.forms.models import BaseInlineFormSet
+from django.shortcuts import redirect
+from django.urls import path
+from . import jobs
+from .models import Category, State, Destination, Review, Wishlist, Job
 
 
 @admin.register(Category)
@@ -21,12 +25,16 @@ class CategoryAdmin(admin.ModelAdmin):
     get_display_name.short_description = 'Display Name'
     
     def destination_count(self, obj):
-        count = obj.destinations.count()
+        count = obj._destination_count
         if count > 0:
             url = reverse('admin:tourism_destination_changelist') + f'?categories__id__exact={obj.id}'
             return format_html('<a href="{}">{} destinations</a>', url, count)
         return '0 destinations'
     destination_count.short_description = 'Destinations'
+    destination_count.admin_order_field = '_destination_count'
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(_destination_count=Count('destinations'))
 
 
 @admin.register(State)
@@ -38,20 +46,48 @@ class StateAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at']
     
     def destination_count(self, obj):
-        count = obj.destination_set.count()
+        count = obj._destination_count
         if count > 0:
             url = reverse('admin:tourism_destination_changelist') + f'?state__id__exact={obj.id}'
             return format_html('<a href="{}">{} destinations</a>', url, count)
         return '0 destinations'
     destination_count.short_description = 'Destinations'
+    destination_count.admin_order_field = '_destination_count'
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(_destination_count=Count('destination'))
+
 
+class RecentReviewFormSet(BaseInlineFormSet):
+    """Only the newest reviews; the rest are in the filtered review changelist"""
+    
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            self._queryset = super().get_queryset().order_by('-created_at')[:RecentReviewInline.max_shown]
+        return self._queryset
 
-class ReviewInline(admin.TabularInline):
+
+class RecentReviewInline(admin.TabularInline):
+    """Read-only preview of a destination's latest reviews"""
     model = Review
-    extra = 0
-    readonly_fields = ['user', 'rating', 'title', 'created_at']
-    can_delete = True
+    formset = RecentReviewFormSet
+    max_shown = 20
+    verbose_name_plural = f'Latest {max_shown} reviews'
+    fields = ['user', 'rating', 'title', 'created_at']
+    readonly_fields = fields
     show_change_link = True
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user')
 
 
 @admin.register(Destination)
@@ -66,7 +102,7 @@ class DestinationAdmin(admin.ModelAdmin):
     ]
     search_fields = ['name', 'city', 'description', 'short_description']
     filter_horizontal = ['categories']
-    readonly_fields = ['created_at', 'updated_at', 'average_rating', 'total_reviews', 'image_preview']
+    readonly_fields = ['created_at', 'updated_at', 'average_rating', 'total_reviews', 'all_reviews', 'image_preview']
     prepopulated_fields = {'slug': ('name',)}
     
     fieldsets = [
@@ -98,7 +134,7 @@ class DestinationAdmin(admin.ModelAdmin):
             'classes': ['collapse']
         }),
         ('Ratings & Reviews', {
-            'fields': ['average_rating', 'total_reviews'],
+            'fields': ['average_rating', 'total_reviews', 'all_reviews'],
             'classes': ['collapse']
         }),
         ('Meta Information', {
@@ -110,70 +146,35 @@ class DestinationAdmin(admin.ModelAdmin):
         })
     ]
     
-    inlines = [ReviewInline]
+    inlines = [RecentReviewInline]
     actions = ['add_sample_images', 'mark_as_featured', 'mark_as_not_featured']
     
-    def add_sample_images(self, request, queryset):
-        """Add sample images to destinations that don't have images"""
-        sample_images = {
-            'cultural': 'https://images.unsplash.com/photo-1564507592333-c60657eea523?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',
-            'historical': 'https://images.unsplash.com/photo-1587474260584-136574528ed5?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',
-            'religious': 'https://images.unsplash.com/photo-1609920658906-8223bd289001?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',
-            'adventure': 'https://images.unsplash.com/photo-1551524164-6cf777e44b37?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',
-            'wildlife': 'https://images.unsplash.com/photo-1549366021-9f761d040a94?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',
-            'beach': 'https://images.unsplash.com/photo-1559827260-dc66d52bef19?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',
-            'mountain': 'https://images.unsplash.com/photo-1464822759844-d150baec4494?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',
-            'eco': 'https://images.unsplash.com/photo-1441974231531-c6227db76b6e?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',
-        }
-        
-        success_count = 0
-        for destination in queryset.filter(main_image=''):
-            try:
-                first_category = destination.categories.first()
-                category_name = first_category.name if first_category else 'cultural'
-                
-                if category_name not in sample_images:
-                    category_name = 'cultural'
-                
-                image_url = sample_images[category_name]
-                response = requests.get(image_url)
-                
-                if response.status_code == 200:
-                    filename = f"{destination.slug}_main.jpg"
-                    destination.main_image.save(
-                        filename,
-                        ContentFile(response.content),
-                        save=True
-                    )
-                    success_count += 1
-            except Exception:
-                continue
-        
+    def enqueue_job(self, request, task_name, queryset, description, **params):
+        """Queue a bulk action for the ``worker`` command and link to its progress"""
+        job = jobs.enqueue(task_name, queryset, description, user=request.user, **params)
+        url = reverse('admin:tourism_job_change', args=[job.pk])
         self.message_user(
             request,
-            f'Successfully added images to {success_count} destinations.',
+            format_html('Queued "{}" for {} destinations. <a href="{}">Follow its progress</a>.',
+                        description, job.total, url),
             messages.SUCCESS
         )
+    
+    def add_sample_images(self, request, queryset):
+        """Add sample images to destinations that don't have images"""
+        self.enqueue_job(
+            request, 'add_sample_images', queryset.filter(main_image=''), 'Add sample images'
+        )
     add_sample_images.short_description = 'Add sample images to selected destinations'
     
     def mark_as_featured(self, request, queryset):
         """Mark selected destinations as featured"""
-        updated = queryset.update(featured=True)
-        self.message_user(
-            request,
-            f'{updated} destinations were successfully marked as featured.',
-            messages.SUCCESS
-        )
+        self.enqueue_job(request, 'set_featured', queryset, 'Mark as featured', featured=True)
     mark_as_featured.short_description = 'Mark selected destinations as featured'
     
     def mark_as_not_featured(self, request, queryset):
         """Remove featured status from selected destinations"""
-        updated = queryset.update(featured=False)
-        self.message_user(
-            request,
-            f'{updated} destinations were successfully unmarked as featured.',
-            messages.SUCCESS
-        )
+        self.enqueue_job(request, 'set_featured', queryset, 'Remove featured status', featured=False)
     mark_as_not_featured.short_description = 'Remove featured status from selected destinations'
     
     def image_preview(self, obj):
@@ -182,6 +183,13 @@ class DestinationAdmin(admin.ModelAdmin):
         return 'No image'
     image_preview.short_description = 'Image Preview'
     
+    def all_reviews(self, obj):
+        if not obj.pk:
+            return '-'
+        url = reverse('admin:tourism_review_changelist') + f'?destination__id__exact={obj.id}'
+        return format_html('<a href="{}">View all {} reviews</a>', url, obj.total_reviews)
+    all_reviews.short_description = 'All Reviews'
+    
     def save_model(self, request, obj, form, change):
         if not change:  # Creating new object
             obj.created_by = request.user
@@ -201,6 +209,8 @@ class ReviewAdmin(admin.ModelAdmin):
     search_fields = ['user__username', 'destination__name', 'title', 'comment']
     readonly_fields = ['created_at', 'updated_at']
     raw_id_fields = ['destination', 'user']
+    # Filtered to one destination from its admin page; skip the unfiltered COUNT(*)
+    show_full_result_count = False
     
     fieldsets = [
         ('Review Information', {
@@ -234,15 +244,78 @@ class WishlistAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related('user', 'destination', 'destination__state')
 
 
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Progress of queued bulk actions; the change page refreshes until a job ends"""
+    list_display = ['description', 'status', 'progress', 'failed', 'created_by', 'created_at', 'finished_at']
+    list_filter = ['status', 'task', 'created_at']
+    search_fields = ['description']
+    fields = [
+        'description', 'task', 'params', 'status', 'progress', 'failed', 'error',
+        'cancel_requested', 'worker', 'created_by', 'created_at', 'started_at',
+        'heartbeat_at', 'finished_at'
+    ]
+    readonly_fields = fields
+    actions = ['cancel_jobs']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_cancel_permission(self, request, obj=None):
+        # Jobs are read-only in the admin, but cancelling needs the model's change permission
+        return super().has_change_permission(request, obj)
+    
+    def progress(self, obj):
+        percentage = obj.get_progress_percentage()
+        return format_html(
+            '<progress value="{}" max="100"></progress> {} / {} ({}%)',
+            percentage, obj.processed, obj.total, percentage
+        )
+    progress.short_description = 'Progress'
+    
+    def cancel_jobs(self, request, queryset):
+        """Cancel queued jobs and stop running ones after their current chunks"""
+        cancelled = jobs.cancel(queryset)
+        self.message_user(request, f'{cancelled} jobs were cancelled or asked to stop.', messages.SUCCESS)
+    cancel_jobs.short_description = 'Cancel selected jobs'
+    cancel_jobs.allowed_permissions = ('cancel',)
+    
+    def get_urls(self):
+        return [
+            path(
+                '<path:object_id>/cancel/',
+                self.admin_site.admin_view(self.cancel_view),
+                name='tourism_job_cancel',
+            ),
+        ] + super().get_urls()
+    
+    def cancel_view(self, request, object_id):
+        if not self.has_cancel_permission(request):
+            raise PermissionDenied
+        if request.method == 'POST':
+            self.cancel_jobs(request, Job.objects.filter(pk=object_id))
+        return redirect('admin:tourism_job_change', object_id)
+    
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        extra_context = {**(extra_context or {}), 'has_cancel_permission': self.has_cancel_permission(request)}
+        return super().change_view(request, object_id, form_url, extra_context)
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('created_by').defer('object_ids')
+
+
 # Also register accounts models
 from accounts.models import UserProfile
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
-    list_display = ['user', 'location', 'phone_number', 'get_review_count', 'get_wishlist_count', 'created_at']
+    list_display = ['user', 'location', 'phone_number', 'review_count', 'wishlist_count', 'trip_count', 'created_at']
     list_filter = ['show_email', 'show_phone', 'created_at']
     search_fields = ['user__username', 'user__email', 'user__first_name', 'user__last_name', 'location']
-    readonly_fields = ['created_at', 'updated_at', 'get_review_count', 'get_wishlist_count']
+    readonly_fields = ['created_at', 'updated_at', 'review_count', 'wishlist_count', 'trip_count']
     raw_id_fields = ['user']
     
     fieldsets = [
@@ -261,7 +334,7 @@ class UserProfileAdmin(admin.ModelAdmin):
             'classes': ['collapse']
         }),
         ('Statistics', {
-            'fields': ['get_review_count', 'get_wishlist_count'],
+            'fields': ['review_count', 'wishlist_count', 'trip_count'],
             'classes': ['collapse']
         }),
         ('Timestamps', {
@@ -0,0 +1,195 @@
+"""
+In-process bitmap index over active destinations.
+
+Every active destination gets a bit position equal to its rank in the
+default listing order (``-featured, -average_rating, name, pk``). Each
+category, state, the featured flag and each distinct rating value map to a
+Python ``int`` used as a bitset, so any combination of listing filters is
+resolved with a handful of ``&`` operations, and reading the set bits from
+the low end yields destinations already in listing order.
+
+The index is derived from the current ``tourism.catalogue`` snapshot, so it
+is rebuilt whenever that is, and listing pages are served from the
+snapshot's records without touching the database.
+"""
+import bisect
+import threading
+from array import array
+from collections import Counter
+from collections.abc import Sequence
+
+from .catalogue import catalogue
+from .trending import TRENDING_SORT, trending
+
+
+def iter_bits(mask, start=0, stop=None):
+    """Yield the positions of set bits in ``mask``, lowest first, sliced"""
+    index = 0
+    while mask and (stop is None or index < stop):
+        low = mask & -mask
+        if index >= start:
+            yield low.bit_length() - 1
+        mask ^= low
+        index += 1
+
+
+class IndexSnapshot:
+    """Immutable set of bitmaps over one ``CatalogueSnapshot``"""
+
+    def __init__(self, catalogue_snapshot):
+        self.catalogue = catalogue_snapshot
+        self.version = catalogue_snapshot.version
+        self.ids = array('q')
+        self.categories = {}
+        self.states = {}
+        self.featured = 0
+        ratings = {}
+
+        for record in catalogue_snapshot.destinations:
+            bit = 1 << record.rank
+            self.ids.append(record.id)
+            self.states[record.state.name] = self.states.get(record.state.name, 0) | bit
+            if record.featured:
+                self.featured |= bit
+            ratings[record.average_rating] = ratings.get(record.average_rating, 0) | bit
+            for category in record.categories:
+                self.categories[category.name] = self.categories.get(category.name, 0) | bit
+        self.all = (1 << len(self.ids)) - 1
+
+        # Rating values ascending, with the OR of every mask at or above each
+        # value, so "rating >= x" is a bisect plus one lookup.
+        self.rating_values = sorted(ratings)
+        self.rating_masks = [0] * len(self.rating_values)
+        cumulative = 0
+        for position in range(len(self.rating_values) - 1, -1, -1):
+            cumulative |= ratings[self.rating_values[position]]
+            self.rating_masks[position] = cumulative
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rating_mask(self, min_rating):
+        position = bisect.bisect_left(self.rating_values, min_rating)
+        return self.rating_masks[position] if position < len(self.rating_masks) else 0
+
+    def mask(self, category=None, state='', min_rating=None, featured=False):
+        """Bitmap of destinations matching all given criteria"""
+        mask = self.all
+        if category:
+            mask &= self.categories.get(category, 0)
+        if state:
+            mask &= self.states.get(state, 0)
+        if min_rating is not None:
+            mask &= self.rating_mask(min_rating)
+        if featured:
+            mask &= self.featured
+        return mask
+
+    def mask_for(self, destination_filter):
+        return self.mask(
+            category=destination_filter.category_name,
+            state=destination_filter.state,
+            min_rating=destination_filter.min_rating,
+            featured=destination_filter.featured,
+        )
+
+    def ids_for(self, mask, start=0, stop=None):
+        """Destination IDs in listing order for the bits of ``mask``"""
+        return [self.ids[rank] for rank in iter_bits(mask, start, stop)]
+
+    def facet_counts(self, destination_filter, rating_buckets):
+        """Per-facet counts, each ignoring its own criterion"""
+        category = destination_filter.category_name
+        state = destination_filter.state
+        min_rating = destination_filter.min_rating
+        featured = destination_filter.featured
+
+        without_category = self.mask(state=state, min_rating=min_rating, featured=featured)
+        without_state = self.mask(category=category, min_rating=min_rating, featured=featured)
+        without_rating = self.mask(category=category, state=state, featured=featured)
+
+        category_counts = Counter({
+            name: (mask & without_category).bit_count() for name, mask in self.categories.items()
+        })
+        state_counts = Counter({
+            name: (mask & without_state).bit_count() for name, mask in self.states.items()
+        })
+        rating_counts = Counter({
+            bucket: (self.rating_mask(bucket) & without_rating).bit_count() for bucket in rating_buckets
+        })
+        total = self.mask_for(destination_filter).bit_count()
+        return +category_counts, +state_counts, rating_counts, total
+
+
+class IndexedDestinations(Sequence):
+    """
+    Listing result backed by a bitmap; slicing returns catalogue records.
+
+    Without ``order`` the records come in default listing order straight
+    from the bitmap; otherwise ``order`` is a sequence of ranks (one of
+    ``CatalogueSnapshot.orders``) filtered down to the bitmap.
+    """
+
+    def __init__(self, snapshot, mask, order=None):
+        self.snapshot = snapshot
+        self.mask = mask
+        self._ranks = None
+        if order is not None:
+            bits = format(mask, 'b')[::-1]
+            self._ranks = [rank for rank in order if rank < len(bits) and bits[rank] == '1']
+        self._length = mask.bit_count()
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            items = self[index:index + 1]
+            if not items:
+                raise IndexError(index)
+            return items[0]
+        start, stop, step = index.indices(self._length)
+        if self._ranks is not None:
+            ranks = self._ranks[start:stop:step]
+        else:
+            ranks = list(iter_bits(self.mask, start, stop))[::step]
+        records = self.snapshot.catalogue.destinations
+        return [records[rank] for rank in ranks]
+
+
+class DestinationIndex:
+    """Process-wide holder of the ``IndexSnapshot`` for the current catalogue"""
+
+    def __init__(self):
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """Return the index of the current catalogue snapshot"""
+        current = catalogue.snapshot()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.catalogue is current:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is None or self._snapshot.catalogue is not current:
+                self._snapshot = IndexSnapshot(current)
+            return self._snapshot
+
+    def warm(self):
+        self.snapshot()
+
+    def resolve(self, destination_filter, sort=None):
+        """
+        Lazy listing of catalogue records matching ``destination_filter``,
+        in default order, by one of ``catalogue.SORT_KEYS`` or trending
+        """
+        snapshot = self.snapshot()
+        if sort == TRENDING_SORT:
+            order = trending.order(snapshot.catalogue)
+        else:
+            order = snapshot.catalogue.orders[sort] if sort else None
+        return IndexedDestinations(snapshot, snapshot.mask_for(destination_filter), order)
+
+
+destination_index = DestinationIndex()
@@ -0,0 +1,336 @@
+"""
+Immutable in-memory snapshot of the active catalogue.
+
+Destinations, states and categories change a few times a day but are read
+on nearly every page, so each worker holds them as compact ``__slots__``
+records indexed by id, slug, state and category, built from one read of
+the database. Change signals invalidate the snapshot (see
+``tourism.signals``); the next reader builds a replacement and swaps it in
+with a single reference assignment, so no request ever sees a half-built
+catalogue. Invalidating also bumps the version in the ``CatalogueVersion``
+row, which every worker re-reads at most once per
+``CATALOGUE_VERSION_CHECK_INTERVAL`` seconds, so other processes rebuild
+too without a shared cache.
+
+A new review only changes its destination's ``REVIEW_STAT_FIELDS``, so it
+bumps ``stats_version`` instead. A worker seeing only that change reads
+just those columns and builds the replacement from its current records,
+re-sorted, rather than re-reading the whole catalogue.
+
+Records expose what templates use on model instances
+(``destination.state.name``, ``destination.categories.all``,
+``destination.main_image.url``, ``category.get_name_display``) but are
+read-only; writes still go through the models. The bitmap index, map
+clusters and tiles are derived from the current snapshot.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import F
+from django.urls import reverse
+
+from .models import CatalogueVersion, Category, Destination, State
+from .routing import primary_reads
+
+CATEGORY_LABELS = dict(Category.CATEGORY_CHOICES)
+
+# Destination fields a review updates; saves of only these bump stats_version
+REVIEW_STAT_FIELDS = frozenset({'average_rating', 'total_reviews', 'updated_at'})
+
+# Columns copied from each active destination row
+DESTINATION_FIELDS = (
+    'id', 'name', 'slug', 'description', 'short_description', 'city',
+    'latitude', 'longitude', 'gallery_images', 'best_time_to_visit',
+    'how_to_reach', 'entry_fee', 'opening_hours', 'historical_significance',
+    'cultural_importance', 'local_cuisine', 'average_rating', 'total_reviews',
+    'featured', 'created_at', 'updated_at',
+)
+
+# Listing sorts besides the default order, as record sort keys
+SORT_KEYS = {
+    'name': lambda record: (record.name, record.id),
+    '-average_rating': lambda record: (-record.average_rating, record.name, record.id),
+    '-total_reviews': lambda record: (-record.total_reviews, record.name, record.id),
+    '-created_at': lambda record: (-record.created_at.timestamp(), record.name, record.id),
+}
+
+
+class RecordList(tuple):
+    """Tuple with the ``all()``/``first()`` that templates call on managers"""
+    __slots__ = ()
+
+    def all(self):
+        return self
+
+    def first(self):
+        return self[0] if self else None
+
+
+class ImageRecord:
+    __slots__ = ('name', 'url')
+
+    def __init__(self, name, url):
+        self.name = name
+        self.url = url
+
+    def __str__(self):
+        return self.name
+
+
+class StateRecord:
+    __slots__ = ('id', 'name', 'code', 'destination_count')
+
+    def __init__(self, id, name, code):
+        self.id = id
+        self.name = name
+        self.code = code
+        self.destination_count = 0
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __str__(self):
+        return self.name
+
+
+class CategoryRecord:
+    __slots__ = ('id', 'name', 'description', 'icon', 'destination_count')
+
+    def __init__(self, id, name, description, icon):
+        self.id = id
+        self.name = name
+        self.description = description
+        self.icon = icon
+        self.destination_count = 0
+
+    @property
+    def pk(self):
+        return self.id
+
+    def get_name_display(self):
+        return CATEGORY_LABELS.get(self.name, self.name)
+
+    def __str__(self):
+        return self.get_name_display()
+
+
+class DestinationRecord:
+    __slots__ = DESTINATION_FIELDS + (
+        'rank', 'state', 'categories', 'main_image', 'name_lower', 'city_lower',
+    )
+
+    def __init__(self, rank, row, state, categories, main_image):
+        for field in DESTINATION_FIELDS:
+            setattr(self, field, row[field])
+        self.rank = rank
+        self.state = state
+        self.categories = categories
+        self.main_image = main_image
+        self.name_lower = self.name.lower()
+        self.city_lower = self.city.lower()
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __str__(self):
+        return f'{self.name}, {self.state.name}'
+
+    def get_absolute_url(self):
+        return reverse('tourism:destination_detail', kwargs={'slug': self.slug})
+
+    def get_category_names(self):
+        return [category.get_name_display() for category in self.categories]
+
+
+class CatalogueSnapshot:
+    """
+    One consistent read of the catalogue.
+
+    ``destinations`` are in the default listing order (``-featured,
+    -average_rating, name, pk``) and each record's ``rank`` is its position
+    there; per-state and per-category tuples keep that order.
+    """
+
+    def __init__(self, states, categories, rows, category_links, image_url, version=None, stats_version=None):
+        self.version = version
+        self.stats_version = stats_version
+        self.image_url = image_url
+        self.states = RecordList(StateRecord(*state) for state in states)
+        self.categories = RecordList(CategoryRecord(*category) for category in categories)
+        self.states_by_name = {state.name: state for state in self.states}
+        self.categories_by_name = {category.name: category for category in self.categories}
+
+        states_by_id = {state.id: state for state in self.states}
+        categories_by_id = {category.id: category for category in self.categories}
+        destination_categories = {}
+        for destination_id, category_id in category_links:
+            destination_categories.setdefault(destination_id, []).append(categories_by_id[category_id])
+
+        destinations = []
+        by_state = {}
+        by_category = {}
+        for rank, row in enumerate(rows):
+            record_categories = RecordList(sorted(
+                destination_categories.get(row['id'], ()), key=lambda category: category.name
+            ))
+            image = row['main_image']
+            record = DestinationRecord(
+                rank, row, states_by_id[row['state_id']], record_categories,
+                ImageRecord(image, image_url(image)) if image else None,
+            )
+            destinations.append(record)
+            by_state.setdefault(record.state.name, []).append(record)
+            for category in record_categories:
+                by_category.setdefault(category.name, []).append(record)
+
+        self.destinations = RecordList(destinations)
+        self.by_id = {record.id: record for record in destinations}
+        self.by_slug = {record.slug: record for record in destinations}
+        self.by_state = {name: RecordList(records) for name, records in by_state.items()}
+        self.by_category = {name: RecordList(records) for name, records in by_category.items()}
+        for state in self.states:
+            state.destination_count = len(self.by_state.get(state.name, ()))
+        for category in self.categories:
+            category.destination_count = len(self.by_category.get(category.name, ()))
+
+        self.featured = RecordList(record for record in destinations if record.featured)
+        self.last_modified = max((record.updated_at for record in destinations), default=None)
+        self.orders = {
+            sort: tuple(record.rank for record in sorted(destinations, key=key))
+            for sort, key in SORT_KEYS.items()
+        }
+
+    def __len__(self):
+        return len(self.destinations)
+
+    def with_review_stats(self, stats, stats_version):
+        """
+        Copy of this snapshot with the review stats in ``stats``, rows of
+        ``(id, average_rating, total_reviews, updated_at)``, in listing order
+        """
+        stats = {row[0]: row[1:] for row in stats}
+        rows = []
+        for record in self.destinations:
+            row = {field: getattr(record, field) for field in DESTINATION_FIELDS}
+            row['state_id'] = record.state.id
+            row['main_image'] = record.main_image.name if record.main_image else None
+            if record.id in stats:
+                row['average_rating'], row['total_reviews'], row['updated_at'] = stats[record.id]
+            rows.append(row)
+        rows.sort(key=lambda row: (not row['featured'], -row['average_rating'], row['name'], row['id']))
+        return CatalogueSnapshot(
+            [(state.id, state.name, state.code) for state in self.states],
+            [(category.id, category.name, category.description, category.icon) for category in self.categories],
+            rows,
+            [(record.id, category.id) for record in self.destinations for category in record.categories],
+            self.image_url, self.version, stats_version,
+        )
+
+    def similar(self, record, limit=4):
+        """Other destinations sharing a category with ``record``, in listing order"""
+        category_ids = {category.id for category in record.categories}
+        similar = []
+        for other in self.destinations:
+            if other is not record and any(category.id in category_ids for category in other.categories):
+                similar.append(other)
+                if len(similar) == limit:
+                    break
+        return similar
+
+    def suggest(self, query, destinations=5, states=3):
+        """Names of destinations (by name or city) and states containing ``query``"""
+        query = query.lower()
+        destination_names = []
+        for record in self.destinations:
+            if query in record.name_lower or query in record.city_lower:
+                destination_names.append(record.name)
+                if len(destination_names) == destinations:
+                    break
+        state_names = [state.name for state in self.states if query in state.name.lower()][:states]
+        return destination_names, state_names
+
+
+class Catalogue:
+    """Process-wide holder of the current ``CatalogueSnapshot``"""
+
+    def __init__(self):
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_checked_at = 0.0
+
+    def build(self, version=None, stats_version=None):
+        # From the primary: a lagging replica would pin stale data until
+        # the next invalidation
+        with primary_reads():
+            states = list(State.objects.order_by('name').values_list('pk', 'name', 'code'))
+            categories = list(Category.objects.order_by('name').values_list(
+                'pk', 'name', 'description', 'icon'
+            ))
+            rows = list(Destination.objects.filter(is_active=True).order_by(
+                '-featured', '-average_rating', 'name', 'pk'
+            ).values(*DESTINATION_FIELDS, 'state_id', 'main_image'))
+            category_links = list(Destination.categories.through.objects.filter(
+                destination__is_active=True
+            ).values_list('destination_id', 'category_id'))
+        storage = Destination._meta.get_field('main_image').storage
+        return CatalogueSnapshot(states, categories, rows, category_links, storage.url, version, stats_version)
+
+    def rebuild_review_stats(self, snapshot, stats_version):
+        """Replacement for ``snapshot`` with freshly read review stats"""
+        with primary_reads():
+            stats = list(Destination.objects.filter(is_active=True).values_list(
+                'id', 'average_rating', 'total_reviews', 'updated_at'
+            ))
+        return snapshot.with_review_stats(stats, stats_version)
+
+    def version(self):
+        """
+        The shared ``(version, stats_version)`` pair, re-read every
+        ``CATALOGUE_VERSION_CHECK_INTERVAL`` seconds
+        """
+        now = time.monotonic()
+        if self._version is None or now - self._version_checked_at >= settings.CATALOGUE_VERSION_CHECK_INTERVAL:
+            with primary_reads():
+                self._version = CatalogueVersion.objects.values_list('version', 'stats_version').first() or (0, 0)
+            self._version_checked_at = now
+        return self._version
+
+    def snapshot(self):
+        """Return a current snapshot, rebuilding it if it was invalidated"""
+        snapshot = self._snapshot
+        version, stats_version = self.version()
+        if snapshot is not None and snapshot.version == version and snapshot.stats_version == stats_version:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is snapshot:
+                if snapshot is not None and snapshot.version == version:
+                    self._snapshot = self.rebuild_review_stats(snapshot, stats_version)
+                else:
+                    self._snapshot = self.build(version, stats_version)
+            return self._snapshot
+
+    def warm(self):
+        self.snapshot()
+
+    def _bump(self, field):
+        if not CatalogueVersion.objects.filter(pk=1).update(**{field: F(field) + 1}):
+            CatalogueVersion.objects.get_or_create(pk=1, defaults={field: 1})
+
+    def review_stats_changed(self):
+        """Bump the stats version so every process re-reads review stats"""
+        self._bump('stats_version')
+        self._version = None
+
+    def invalidate(self):
+        """Drop the snapshot here and bump the version other processes check"""
+        self._bump('version')
+        self._snapshot = None
+        self._version = None
+
+
+catalogue = Catalogue()
@@ -0,0 +1,298 @@
+"""
+Server-side marker clustering for the interactive map.
+
+Destinations are projected to Web Mercator and bucketed into a grid of
+64px cells at every zoom level. Cells nest exactly (each zoom halves the
+cell size), so each level is built by merging the four children of the
+level below, giving a supercluster-style hierarchy in O(points) work. A
+viewport query then only visits the cells that cover its bounding box.
+"""
+import hashlib
+import json
+import math
+import threading
+from collections import OrderedDict
+
+from .bitmap_index import destination_index
+
+# Deepest zoom with clustering; above it every destination is its own marker
+MAX_CLUSTER_ZOOM = 16
+
+# log2 of cells per 256px tile edge: 2 -> 64px cells
+GRID_SHIFT = 2
+
+MAX_LATITUDE = 85.05112878
+
+# Cluster indexes kept per distinct filter result
+MAX_CACHED_INDEXES = 32
+
+# Tile fingerprints are sums of 128-bit point hashes, so they compose
+# across cells in any order
+HASH_MASK = (1 << 128) - 1
+
+
+def project(lng, lat):
+    """Longitude/latitude to Web Mercator coordinates in [0, 1]"""
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    x = (lng + 180.0) / 360.0
+    sin = math.sin(math.radians(lat))
+    y = 0.5 - math.log((1 + sin) / (1 - sin)) / (4 * math.pi)
+    return min(max(x, 0.0), 1.0), min(max(y, 0.0), 1.0)
+
+
+def _cell_scale(zoom):
+    return 1 << (zoom + GRID_SHIFT)
+
+
+class ClusterIndex:
+    """Grid cluster hierarchy over a fixed list of points"""
+
+    def __init__(self, points, digest=''):
+        self.points = points
+        self.digest = digest
+        self.levels = {}
+        self.members = {}
+        self._hashes = None
+
+        # Cluster cells are [count, sum of lng, sum of lat, first point index]
+        scale = _cell_scale(MAX_CLUSTER_ZOOM)
+        cells = {}
+        for index, point in enumerate(points):
+            x, y = project(point['longitude'], point['latitude'])
+            key = (min(int(x * scale), scale - 1), min(int(y * scale), scale - 1))
+            cell = cells.get(key)
+            if cell is None:
+                cells[key] = [1, point['longitude'], point['latitude'], index]
+                self.members[key] = [index]
+            else:
+                cell[0] += 1
+                cell[1] += point['longitude']
+                cell[2] += point['latitude']
+                self.members[key].append(index)
+        self.levels[MAX_CLUSTER_ZOOM] = cells
+
+        for zoom in range(MAX_CLUSTER_ZOOM - 1, -1, -1):
+            parents = {}
+            for (x, y), (count, sum_lng, sum_lat, first) in self.levels[zoom + 1].items():
+                key = (x >> 1, y >> 1)
+                parent = parents.get(key)
+                if parent is None:
+                    parents[key] = [count, sum_lng, sum_lat, first]
+                else:
+                    parent[0] += count
+                    parent[1] += sum_lng
+                    parent[2] += sum_lat
+            self.levels[zoom] = parents
+
+    def _cells_in_bbox(self, zoom, bbox):
+        cells = self.levels[zoom]
+        min_lng, min_lat, max_lng, max_lat = bbox
+        scale = _cell_scale(zoom)
+        x0, y1 = project(min_lng, min_lat)
+        x1, y0 = project(max_lng, max_lat)
+        x0, x1 = int(x0 * scale), min(int(x1 * scale), scale - 1)
+        y0, y1 = int(y0 * scale), min(int(y1 * scale), scale - 1)
+
+        if x0 > x1 or (x1 - x0 + 1) * (y1 - y0 + 1) > len(cells):
+            # Antimeridian-crossing or very large boxes: scan instead
+            for key, cell in cells.items():
+                if x0 > x1 or (x0 <= key[0] <= x1 and y0 <= key[1] <= y1):
+                    yield key, cell
+            return
+
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                cell = cells.get((x, y))
+                if cell is not None:
+                    yield (x, y), cell
+
+    def expansion_zoom(self, zoom, key):
+        """First zoom at which the cluster at ``zoom``/``key`` splits up"""
+        x, y = key
+        while zoom < MAX_CLUSTER_ZOOM:
+            zoom += 1
+            children = [
+                (cx, cy) for cx in (2 * x, 2 * x + 1) for cy in (2 * y, 2 * y + 1)
+                if (cx, cy) in self.levels[zoom]
+            ]
+            if len(children) > 1:
+                return zoom
+            x, y = children[0]
+        return MAX_CLUSTER_ZOOM + 1
+
+    def point_feature(self, index):
+        point = self.points[index]
+        properties = {key: value for key, value in point.items() if key not in ('latitude', 'longitude')}
+        return {
+            'type': 'Feature',
+            'id': point['id'],
+            'geometry': {'type': 'Point', 'coordinates': [point['longitude'], point['latitude']]},
+            'properties': properties,
+        }
+
+    def features(self, bbox, zoom):
+        """GeoJSON features (clusters and single points) visible in ``bbox``"""
+        zoom = max(0, int(zoom))
+        if zoom > MAX_CLUSTER_ZOOM:
+            return [
+                self.point_feature(index)
+                for key, _ in self._cells_in_bbox(MAX_CLUSTER_ZOOM, bbox)
+                for index in self.members[key]
+            ]
+        return self._cell_features(zoom, self._cells_in_bbox(zoom, bbox))
+
+    def _deep_tile_points(self, zoom, x, y):
+        """Indexes of the points on a tile deeper than ``MAX_CLUSTER_ZOOM``"""
+        # Deep tiles fall inside clustering cells; keep the points whose
+        # position is actually on this tile.
+        shift = MAX_CLUSTER_ZOOM + GRID_SHIFT - zoom
+        if shift >= 0:
+            x_cells = range(x << shift, (x + 1) << shift)
+            y_cells = range(y << shift, (y + 1) << shift)
+        else:
+            x_cells, y_cells = [x >> -shift], [y >> -shift]
+        scale = 1 << zoom
+        for cx in x_cells:
+            for cy in y_cells:
+                for index in self.members.get((cx, cy), ()):
+                    point = self.points[index]
+                    px, py = project(point['longitude'], point['latitude'])
+                    if int(px * scale) == x and int(py * scale) == y:
+                        yield index
+
+    def tile_features(self, zoom, x, y):
+        """Features of the ``zoom``/``x``/``y`` web map tile"""
+        if zoom > MAX_CLUSTER_ZOOM:
+            return [self.point_feature(index) for index in self._deep_tile_points(zoom, x, y)]
+
+        cells = self.levels[zoom]
+        size = 1 << GRID_SHIFT
+        return self._cell_features(zoom, (
+            ((cx, cy), cells[(cx, cy)])
+            for cx in range(x * size, (x + 1) * size)
+            for cy in range(y * size, (y + 1) * size)
+            if (cx, cy) in cells
+        ))
+
+    def _tile_hashes(self):
+        """Per-point hashes, and their sums per cell at every level"""
+        if self._hashes is None:
+            point_hashes = [
+                int(hashlib.md5(json.dumps(point, sort_keys=True).encode()).hexdigest(), 16)
+                for point in self.points
+            ]
+            levels = {MAX_CLUSTER_ZOOM: {
+                key: sum(point_hashes[index] for index in members) & HASH_MASK
+                for key, members in self.members.items()
+            }}
+            for zoom in range(MAX_CLUSTER_ZOOM - 1, -1, -1):
+                parents = {}
+                for (x, y), value in levels[zoom + 1].items():
+                    key = (x >> 1, y >> 1)
+                    parents[key] = (parents.get(key, 0) + value) & HASH_MASK
+                levels[zoom] = parents
+            self._hashes = point_hashes, levels
+        return self._hashes
+
+    def tile_fingerprint(self, zoom, x, y):
+        """
+        Hash of the data of every point on a tile. A tile's features depend
+        on nothing else (its clusters come from cells nested inside it), so
+        equal fingerprints mean equal tiles.
+        """
+        point_hashes, levels = self._tile_hashes()
+        if zoom > MAX_CLUSTER_ZOOM:
+            total = sum(point_hashes[index] for index in self._deep_tile_points(zoom, x, y))
+        else:
+            # Cells GRID_SHIFT levels up are tile-sized; zooms 0-1 sum level 0
+            level = max(zoom - GRID_SHIFT, 0)
+            shift = level + GRID_SHIFT - zoom
+            if shift:
+                total = sum(
+                    value for (cx, cy), value in levels[level].items()
+                    if cx >> shift == x and cy >> shift == y
+                )
+            else:
+                total = levels[level].get((x, y), 0)
+        return f'{total & HASH_MASK:032x}'
+
+    def _cell_features(self, zoom, cells):
+        features = []
+        for key, (count, sum_lng, sum_lat, first) in cells:
+            if count == 1:
+                features.append(self.point_feature(first))
+                continue
+            features.append({
+                'type': 'Feature',
+                'id': f'cluster-{zoom}-{key[0]}-{key[1]}',
+                'geometry': {
+                    'type': 'Point',
+                    'coordinates': [round(sum_lng / count, 6), round(sum_lat / count, 6)],
+                },
+                'properties': {
+                    'cluster': True,
+                    'point_count': count,
+                    'expansion_zoom': self.expansion_zoom(zoom, key),
+                },
+            })
+        return features
+
+
+class MapClusters:
+    """
+    Cluster indexes for the map, one per distinct filter result.
+
+    Point data is taken from the catalogue snapshot whenever the bitmap
+    index is rebuilt for a new one, which happens after any catalogue change.
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._points = {}
+        self._digest = ''
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load_points(self, catalogue_snapshot):
+        points = {}
+        for record in catalogue_snapshot.destinations:
+            if record.latitude is None or record.longitude is None:
+                continue
+            points[record.id] = {
+                'id': record.id,
+                'name': record.name,
+                'slug': record.slug,
+                'city': record.city,
+                'state': record.state.name,
+                'average_rating': float(record.average_rating),
+                'featured': record.featured,
+                'categories': [category.name for category in record.categories],
+                'latitude': float(record.latitude),
+                'longitude': float(record.longitude),
+            }
+        digest = hashlib.md5(json.dumps(sorted(points.items()), sort_keys=True).encode()).hexdigest()
+        return points, digest
+
+    def get(self, destination_filter):
+        """Return the ``ClusterIndex`` for destinations matching the filter"""
+        snapshot = destination_index.snapshot()
+        with self._lock:
+            if snapshot is not self._snapshot:
+                self._points, self._digest = self._load_points(snapshot.catalogue)
+                self._indexes.clear()
+                self._snapshot = snapshot
+
+            mask = snapshot.mask_for(destination_filter)
+            index = self._indexes.get(mask)
+            if index is None:
+                points = [self._points[pk] for pk in snapshot.ids_for(mask) if pk in self._points]
+                digest = hashlib.md5(f'{self._digest}:{mask:x}'.encode()).hexdigest()
+                index = self._indexes[mask] = ClusterIndex(points, digest)
+                if len(self._indexes) > MAX_CACHED_INDEXES:
+                    self._indexes.popitem(last=False)
+            else:
+                self._indexes.move_to_end(mask)
+            return index
+
+
+map_clusters = MapClusters()
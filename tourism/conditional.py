@@ -0,0 +1,120 @@
+"""
+Conditional GET support for JSON endpoints.
+
+``conditional_json`` wraps a view with Django's ``condition()`` so that a
+matching ``If-None-Match``/``If-Modified-Since`` is answered with
+``304 Not Modified`` before the view runs, and sets ``Cache-Control`` per
+endpoint. Async views are supported; their version lookups may be
+coroutines and sync ones are run off the event loop.
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers, set_response_etag,
+)
+from django.views.decorators.http import condition
+
+
+def memoize_on_request(func):
+    """Cache a ``func(request, *args, **kwargs)`` result for the current request"""
+    attribute = f'_memo_{func.__module__}_{func.__qualname__}'.replace('.', '_')
+
+    def lookup(request, args, kwargs):
+        memo = getattr(request, attribute, None)
+        if memo is None:
+            memo = {}
+            setattr(request, attribute, memo)
+        return memo, (args, tuple(sorted(kwargs.items())))
+
+    if iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(request, *args, **kwargs):
+            memo, key = lookup(request, args, kwargs)
+            if key not in memo:
+                memo[key] = await func(request, *args, **kwargs)
+            return memo[key]
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(request, *args, **kwargs):
+        memo, key = lookup(request, args, kwargs)
+        if key not in memo:
+            memo[key] = func(request, *args, **kwargs)
+        return memo[key]
+    return wrapper
+
+
+async def _aresolve(func, request, *args, **kwargs):
+    if func is None:
+        return None
+    if iscoroutinefunction(func):
+        return await func(request, *args, **kwargs)
+    return await sync_to_async(func)(request, *args, **kwargs)
+
+
+def _strong_etag(request, user, version):
+    user = user.pk if user is not None and user.is_authenticated else ''
+    key = f'{request.path}?{request.GET.urlencode()}|{user}|{version}'
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def conditional_json(version=None, last_modified=None, **cache_control):
+    """
+    Make a JSON view answer conditional requests.
+
+    ``version(request, *args, **kwargs)`` returns a value that changes
+    whenever the response would (e.g. ``max(updated_at)`` and a row count),
+    or ``None`` when it can't tell. It is hashed with the path, query string
+    and user into a strong ETag, so ``304`` responses skip the view. With no
+    ``version`` the ETag is a hash of the rendered body, which saves the
+    transfer but not the work. ``last_modified`` works like ``condition()``'s
+    ``last_modified_func``; ``cache_control`` is passed to
+    ``patch_cache_control`` for ``200`` and ``304`` responses, and
+    ``private=True`` also adds ``Vary: Cookie``. ``version`` and
+    ``last_modified`` may be coroutine functions when the view is async.
+    """
+    def etag_func(request, *args, **kwargs):
+        if version is None:
+            return None
+        value = version(request, *args, **kwargs)
+        return None if value is None else _strong_etag(request, getattr(request, 'user', None), value)
+
+    def finish(request, response):
+        if (version is None and request.method in ('GET', 'HEAD')
+                and response.status_code == 200 and not response.has_header('ETag')):
+            set_response_etag(response)
+            response = get_conditional_response(request, etag=response['ETag'], response=response)
+
+        if response.status_code in (200, 304):
+            if cache_control:
+                patch_cache_control(response, **cache_control)
+            if cache_control.get('private'):
+                patch_vary_headers(response, ['Cookie'])
+        return response
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                value = await _aresolve(version, request, *args, **kwargs)
+                modified = await _aresolve(last_modified, request, *args, **kwargs)
+                etag = None
+                if value is not None:
+                    user = await request.auser() if hasattr(request, 'auser') else None
+                    etag = _strong_etag(request, user, value)
+                conditional_view = condition(
+                    etag_func=lambda *a, **k: etag,
+                    last_modified_func=lambda *a, **k: modified,
+                )(view)
+                return finish(request, await conditional_view(request, *args, **kwargs))
+            return async_wrapper
+
+        conditional_view = condition(etag_func=etag_func, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return finish(request, conditional_view(request, *args, **kwargs))
+        return wrapper
+    return decorator
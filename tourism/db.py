@@ -0,0 +1,28 @@
+"""
+Per-connection database setup.
+
+SQLite keeps most tuning per connection, so ``settings.SQLITE_PRAGMAS`` is
+applied whenever Django opens one. With ``CONN_MAX_AGE`` each worker
+thread reuses its connection across requests and pays for this once.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def apply_sqlite_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = dict(getattr(settings, 'SQLITE_PRAGMAS', {}))
+    if connection.alias in getattr(settings, 'READ_REPLICAS', ()):
+        # A write routed to a replica copy by mistake should fail loudly
+        pragmas['query_only'] = 'ON'
+    if pragmas:
+        with connection.cursor() as cursor:
+            apply_sqlite_pragmas(cursor, pragmas)
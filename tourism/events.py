@@ -0,0 +1,88 @@
+"""
+Batched ingestion of analytics events.
+
+``events.record()`` appends to an in-process ring buffer and returns; it
+never touches the database. A daemon thread drains the buffer every
+``EVENTS_FLUSH_INTERVAL`` seconds (sooner once it is half full) and writes
+each kind to its own table with ``bulk_create``, so read traffic costs one
+batched insert per interval per worker instead of a write per request.
+
+Analytics are allowed to be lossy: when the buffer is full the oldest
+events are overwritten and counted in ``dropped``, and a failed flush is
+logged rather than retried. The ``rollup_events`` command aggregates raw
+events into ``DailyEventCount`` and prunes them.
+"""
+import atexit
+import logging
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .flusher import BufferedFlusher
+from .models import DestinationViewEvent, MapOpenEvent, SearchEvent, SuggestionClickEvent
+
+logger = logging.getLogger(__name__)
+
+EVENT_MODELS = {
+    'view': DestinationViewEvent,
+    'search': SearchEvent,
+    'suggestion_click': SuggestionClickEvent,
+    'map_open': MapOpenEvent,
+}
+
+# Event kinds browsers report themselves, with the field they send
+CLIENT_EVENTS = {
+    'suggestion_click': 'suggestion',
+}
+
+
+class EventPipeline(BufferedFlusher):
+    """Process-wide ring buffer and its flush thread"""
+    thread_name = 'event-flush'
+    interval_setting = 'EVENTS_FLUSH_INTERVAL'
+
+    def __init__(self):
+        super().__init__()
+        self._buffer = deque(maxlen=settings.EVENTS_BUFFER_SIZE)
+        self.dropped = 0
+
+    def record(self, kind, user=None, **fields):
+        """Queue one event of ``kind`` (a key of ``EVENT_MODELS``)"""
+        if kind not in EVENT_MODELS:
+            raise ValueError(f'Unknown event kind {kind!r}')
+        user_id = user.pk if user is not None and user.is_authenticated else None
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append((kind, timezone.now(), user_id, fields))
+        if len(self._buffer) * 2 >= self._buffer.maxlen:
+            self._wake.set()
+        self._ensure_thread()
+
+    def drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self._buffer.popleft())
+            except IndexError:
+                return batch
+
+    def write(self, batch):
+        rows = defaultdict(list)
+        for kind, created_at, user_id, fields in batch:
+            rows[EVENT_MODELS[kind]].append(
+                EVENT_MODELS[kind](created_at=created_at, user_id=user_id, **fields)
+            )
+        try:
+            with transaction.atomic():
+                for model, events in rows.items():
+                    model.objects.bulk_create(events, batch_size=500)
+        except Exception:
+            logger.exception('Could not write %d analytics events', len(batch))
+            return 0
+        return len(batch)
+
+
+events = EventPipeline()
+atexit.register(events.flush)
@@ -0,0 +1,102 @@
+"""
+Facet counts for destination listings.
+
+Counts follow the usual faceted-search convention: each facet is counted
+against every active filter except its own, so the sidebar shows how many
+results picking another category, state or rating would give. Without a
+text search the counts come from the in-process bitmap index; otherwise
+from a single query over the search-filtered destinations.
+"""
+from collections import Counter
+from decimal import Decimal
+
+from .bitmap_index import destination_index
+from .models import Category, Destination
+
+# Minimum-rating thresholds offered by the listing filter, highest first
+RATING_BUCKETS = [Decimal('4.5'), Decimal('4.0'), Decimal('3.5')]
+
+CATEGORY_LABELS = dict(Category.CATEGORY_CHOICES)
+
+
+def compute_facets(destination_filter, queryset=None):
+    """
+    Return category, state and rating counts for ``destination_filter``.
+
+    The result is a plain dict, usable both as template context and as a
+    JSON response body.
+    """
+    if queryset is None and not destination_filter.search:
+        counts = destination_index.snapshot().facet_counts(destination_filter, RATING_BUCKETS)
+    else:
+        counts = _count_facets(destination_filter, queryset)
+    return _format_facets(destination_filter, *counts)
+
+
+def _count_facets(destination_filter, queryset=None):
+    if queryset is None:
+        queryset = Destination.objects.filter(is_active=True)
+
+    # Only the non-faceted criteria go to the database; facet criteria are
+    # evaluated per destination below.
+    base = destination_filter.replace(category=None, state='', min_rating=None).apply(queryset)
+    rows = base.order_by().values_list('pk', 'state__name', 'average_rating', 'categories__name')
+
+    destinations = {}
+    for pk, state, rating, category in rows:
+        entry = destinations.setdefault(pk, (state, rating, set()))
+        if category:
+            entry[2].add(category)
+
+    selected_category = destination_filter.category_name
+    selected_state = destination_filter.state
+    min_rating = destination_filter.min_rating
+
+    category_counts, state_counts, rating_counts = Counter(), Counter(), Counter()
+    total = 0
+    for state, rating, categories in destinations.values():
+        in_category = not selected_category or selected_category in categories
+        in_state = not selected_state or state == selected_state
+        in_rating = min_rating is None or rating >= min_rating
+
+        if in_state and in_rating:
+            category_counts.update(categories)
+        if in_category and in_rating:
+            state_counts[state] += 1
+        if in_category and in_state:
+            rating_counts.update(bucket for bucket in RATING_BUCKETS if rating >= bucket)
+        if in_category and in_state and in_rating:
+            total += 1
+
+    return category_counts, state_counts, rating_counts, total
+
+
+def _format_facets(destination_filter, category_counts, state_counts, rating_counts, total):
+    selected_category = destination_filter.category_name
+    selected_state = destination_filter.state
+    min_rating = destination_filter.min_rating
+
+    return {
+        'total': total,
+        'categories': sorted([
+            {
+                'name': name,
+                'label': CATEGORY_LABELS.get(name, name),
+                'count': category_counts[name],
+                'selected': name == selected_category,
+            }
+            for name in set(category_counts) | ({selected_category} if selected_category else set())
+        ], key=lambda facet: facet['label']),
+        'states': sorted([
+            {'name': name, 'count': state_counts[name], 'selected': name == selected_state}
+            for name in set(state_counts) | ({selected_state} if selected_state else set())
+        ], key=lambda facet: facet['name']),
+        'ratings': [
+            {
+                'min_rating': str(bucket),
+                'count': rating_counts[bucket],
+                'selected': min_rating is not None and bucket == Decimal(str(min_rating)),
+            }
+            for bucket in RATING_BUCKETS
+        ],
+    }
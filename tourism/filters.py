@@ -0,0 +1,101 @@
+"""
+Reusable filter builder for destination listings.
+
+Category conditions are expressed as ``EXISTS`` semi-joins against the
+destination/category through table rather than joins, so a destination
+matching several categories is never duplicated and listings don't need
+``DISTINCT`` over wide rows.
+"""
+from django.db.models import Exists, OuterRef, Q
+
+from .models import Category, Destination
+
+DestinationCategory = Destination.categories.through
+
+# Text columns matched by the destinations listing search box
+LISTING_SEARCH_FIELDS = ['name', 'city', 'state__name', 'description', 'short_description']
+
+# Text columns matched by the site-wide search page
+SITE_SEARCH_FIELDS = ['name', 'city', 'state__name', 'description', 'local_cuisine', 'cultural_importance']
+
+
+def category_exists(**lookups):
+    """
+    Semi-join matching destinations linked to a category.
+
+    ``lookups`` apply to the through table, e.g. ``category__name='beach'``
+    or ``category_id__in=[1, 2]``.
+    """
+    return Exists(DestinationCategory.objects.filter(destination_id=OuterRef('pk'), **lookups))
+
+
+def search_q(query, fields=LISTING_SEARCH_FIELDS, categories=False):
+    """Case-insensitive match of ``query`` against ``fields`` (and category names)"""
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f'{field}__icontains': query})
+    if categories:
+        condition |= category_exists(category__name__icontains=query)
+    return condition
+
+
+class DestinationFilter:
+    """Filters shared by the destination listing views"""
+
+    def __init__(self, search='', category=None, state='', min_rating=None, featured=False,
+                 search_fields=LISTING_SEARCH_FIELDS, search_categories=False):
+        self.search = (search or '').strip()
+        self.category = category
+        self.state = state or ''
+        self.min_rating = min_rating
+        self.featured = featured
+        self.search_fields = search_fields
+        self.search_categories = search_categories
+
+    @classmethod
+    def from_params(cls, params, **kwargs):
+        """Build a filter from listing query parameters (``request.GET``)"""
+        min_rating = params.get('rating')
+        try:
+            min_rating = float(min_rating) if min_rating else None
+        except (ValueError, TypeError):
+            min_rating = None
+
+        return cls(
+            search=params.get('search', ''),
+            category=params.get('category') or None,
+            state=params.get('state', ''),
+            min_rating=min_rating,
+            featured=params.get('featured') in ('1', 'true'),
+            **kwargs
+        )
+
+    def replace(self, **changes):
+        """Return a copy of this filter with some criteria changed"""
+        params = dict(vars(self))
+        params.update(changes)
+        return type(self)(**params)
+
+    @property
+    def category_name(self):
+        return getattr(self.category, 'name', self.category)
+
+    def get_conditions(self):
+        """Return the list of ``Q``/``Exists`` conditions for this filter"""
+        conditions = []
+        if self.search:
+            conditions.append(search_q(self.search, self.search_fields, self.search_categories))
+        if isinstance(self.category, Category):
+            conditions.append(category_exists(category_id=self.category.pk))
+        elif self.category:
+            conditions.append(category_exists(category__name=self.category))
+        if self.state:
+            conditions.append(Q(state__name=self.state))
+        if self.min_rating is not None:
+            conditions.append(Q(average_rating__gte=self.min_rating))
+        if self.featured:
+            conditions.append(Q(featured=True))
+        return conditions
+
+    def apply(self, queryset):
+        return queryset.filter(*self.get_conditions())
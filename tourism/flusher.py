@@ -0,0 +1,67 @@
+"""
+Background writer for process-wide buffers.
+
+Analytics events (``tourism.events``) and trending counters
+(``tourism.trending``) are collected in memory by requests and written out
+by a daemon thread per buffer, every few seconds or sooner when woken, on
+the thread's own connection. ``flush()`` may also be called directly (the
+``rollup_events`` command and ``atexit`` do); flushes never overlap.
+"""
+import threading
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.db import connection
+
+
+class BufferedFlusher(ABC):
+    """
+    Daemon thread calling ``flush()`` every ``interval_setting`` seconds.
+
+    Subclasses implement ``drain`` to take everything buffered and ``write``
+    to store it; buffering calls ``_ensure_thread`` and, once a flush should
+    not wait for the interval, ``_wake.set()``.
+    """
+    thread_name = None
+    interval_setting = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    @abstractmethod
+    def drain(self):
+        """Remove and return the buffered items, falsy when there are none"""
+
+    @abstractmethod
+    def write(self, batch):
+        """Store a drained batch; returns the number of items written"""
+
+    def _ensure_thread(self):
+        # Also restarts the thread in a process forked after it started
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(getattr(settings, self.interval_setting))
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of items written"""
+        with self._flush_lock:
+            batch = self.drain()
+            if not batch:
+                return 0
+            try:
+                return self.write(batch)
+            finally:
+                if threading.current_thread() is self._thread:
+                    connection.close()
@@ -0,0 +1,189 @@
+"""
+Background jobs for bulk actions too large for one admin request.
+
+``enqueue()`` records the primary keys of a queryset in a ``Job`` row
+and returns at once. The ``worker`` command claims queued jobs one at a
+time (an ``UPDATE ... WHERE status = 'queued'``, so several workers can
+share the table) and hands their IDs in chunks to a process pool, with
+at most a few chunks in flight. After each chunk, or every
+``JOBS_HEARTBEAT_INTERVAL`` seconds while chunks run, it adds to the job's
+``processed`` and ``failed`` counts and re-reads ``cancel_requested``.
+Once cancellation is requested it stops handing out chunks, lets the ones
+in flight finish and marks the job cancelled. Queued jobs are cancelled
+straight away.
+
+Tasks are plain functions registered with ``@task``. Each one gets a list
+of IDs plus the job's params and returns how many of them failed. A job
+whose worker stops sending heartbeats is requeued from the start, so
+tasks must be safe to run twice on the same objects. A worker only
+updates a job while it is still ``running`` under that worker's name, so
+a worker that lost its job cannot overwrite the next run's progress or
+outcome.
+"""
+import logging
+import os
+import socket
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def task(name, chunk_size=None):
+    """Register a function as the job task ``name``"""
+    def register(function):
+        function.chunk_size = chunk_size or settings.JOBS_CHUNK_SIZE
+        TASKS[name] = function
+        return function
+    return register
+
+
+def enqueue(task_name, queryset, description, user=None, **params):
+    """Queue ``task_name`` over every object in ``queryset``; returns the ``Job``"""
+    if task_name not in TASKS:
+        raise ValueError(f'Unknown job task {task_name!r}')
+    object_ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+    return Job.objects.create(
+        task=task_name,
+        description=description,
+        params=params,
+        object_ids=object_ids,
+        total=len(object_ids),
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+
+
+def cancel(queryset):
+    """Cancel queued jobs and ask running ones to stop; returns the number affected"""
+    cancelled = queryset.filter(status='queued').update(
+        status='cancelled', cancel_requested=True, finished_at=timezone.now()
+    )
+    return cancelled + queryset.filter(status='running').update(cancel_requested=True)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim_next(worker):
+    """Mark the oldest queued job as running on ``worker`` and return it, or None"""
+    while True:
+        pk = Job.objects.filter(status='queued').order_by('created_at').values_list('pk', flat=True).first()
+        if pk is None:
+            return None
+        now = timezone.now()
+        claimed = Job.objects.filter(pk=pk, status='queued').update(
+            status='running', worker=worker, started_at=now, heartbeat_at=now
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+        # Another worker got there first
+
+
+def requeue(queryset):
+    """Put jobs back in the queue to run again from the start"""
+    return queryset.update(
+        status='queued', worker='', processed=0, failed=0, started_at=None, heartbeat_at=None
+    )
+
+
+def requeue_stale():
+    """Requeue running jobs whose worker has gone quiet; returns how many"""
+    now = timezone.now()
+    stale = Job.objects.filter(status='running', heartbeat_at__lt=now - timedelta(seconds=settings.JOBS_STALE_AFTER))
+    stale.filter(cancel_requested=True).update(status='cancelled', finished_at=now)
+    return requeue(stale.filter(cancel_requested=False))
+
+
+def run_chunk(task_name, object_ids, params):
+    """Run one chunk of a job; called in a worker process"""
+    return TASKS[task_name](object_ids, **params) or 0
+
+
+def run(job, pool, in_flight):
+    """
+    Run a claimed job's chunks on ``pool``, keeping at most ``in_flight``
+    submitted, and record how it ended. Returns the final status, or None
+    if the job was taken from this worker meanwhile; raises
+    ``BrokenProcessPool`` if a pool process dies.
+    """
+    function = TASKS.get(job.task)
+    if function is None:
+        return finish(job, 'failed', f'Unknown job task {job.task!r}')
+    owned = _owned(job)
+
+    chunk_size = function.chunk_size
+    ids = job.object_ids
+    chunks = (ids[start:start + chunk_size] for start in range(0, len(ids), chunk_size))
+    pending = {}
+    errors = []
+    stopping = False
+
+    def submit():
+        for chunk in islice(chunks, in_flight - len(pending)):
+            pending[pool.submit(run_chunk, job.task, chunk, job.params)] = len(chunk)
+
+    submit()
+    while pending:
+        done, _ = wait(pending, timeout=settings.JOBS_HEARTBEAT_INTERVAL, return_when=FIRST_COMPLETED)
+        processed = failed = 0
+        for future in done:
+            size = pending.pop(future)
+            processed += size
+            try:
+                failed += future.result()
+            except BrokenProcessPool:
+                raise
+            except Exception as exc:
+                # The whole chunk counts as failed; the rest of the job carries on
+                logger.exception('Chunk of job %s failed', job.pk)
+                failed += size
+                errors.append(f'{type(exc).__name__}: {exc}')
+        still_owned = owned.update(
+            processed=F('processed') + processed,
+            failed=F('failed') + failed,
+            heartbeat_at=timezone.now(),
+        )
+        if not still_owned:
+            # Requeued as stale: let the chunks in flight finish, count nothing more
+            logger.warning('Job %s was taken from worker %s; stopping', job.pk, job.worker)
+            for future in pending:
+                future.cancel()
+            wait(pending)
+            return None
+        if not stopping:
+            stopping = owned.filter(cancel_requested=True).exists()
+        if not stopping:
+            submit()
+
+    if stopping:
+        status = 'cancelled'
+    elif errors:
+        status = 'failed'
+    else:
+        status = 'succeeded'
+    return finish(job, status, '\n'.join(errors))
+
+
+def _owned(job):
+    """The job's row while it is still running on the worker that claimed it"""
+    return Job.objects.filter(pk=job.pk, worker=job.worker, status='running')
+
+
+def finish(job, status, error=''):
+    """
+    Record how a job ended; returns ``status``, or None if the job is no
+    longer running on this worker (it was requeued and may run again)
+    """
+    finished = _owned(job).update(status=status, error=error, finished_at=timezone.now())
+    return status if finished else None
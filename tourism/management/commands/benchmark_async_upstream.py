@@ -0,0 +1,159 @@
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import aiohttp
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tourism.models import PlaceWeatherCache
+
+WEATHER_BODY = json.dumps({
+    'main': {'temp': 28.5, 'humidity': 60},
+    'weather': [{'description': 'clear sky', 'icon': '01d'}],
+    'wind': {'speed': 3.2},
+}).encode()
+
+# Benchmark requests use latitudes below this so their cache rows can be removed
+BENCHMARK_LATITUDE = -89
+
+
+class FakeUpstream:
+    """Minimal keep-alive HTTP server answering every request after a delay"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.port = None
+        self._ready = threading.Event()
+        self._loop = None
+
+    async def _handle(self, reader, writer):
+        try:
+            while await reader.readuntil(b'\r\n\r\n'):
+                await asyncio.sleep(self.delay)
+                writer.write(
+                    b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                    b'Content-Length: %d\r\n\r\n%s' % (len(WEATHER_BODY), WEATHER_BODY)
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _serve(self):
+        server = await asyncio.start_server(self._handle, '127.0.0.1', 0, backlog=4096)
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        async with server:
+            await server.serve_forever()
+
+    def start(self):
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self._serve())
+
+        threading.Thread(target=run, daemon=True).start()
+        self._ready.wait()
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure how /api/weather/ scales with concurrent clients under uvicorn, '
+        'against a local fake OpenWeather that answers after a fixed delay'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            nargs='+',
+            default=[1, 10, 100, 300],
+            help='Concurrent client counts to run (default: 1 10 100 300)',
+        )
+        parser.add_argument(
+            '--delay',
+            type=float,
+            default=0.5,
+            help='Seconds the fake upstream takes per request (default 0.5)',
+        )
+        parser.add_argument('--port', type=int, default=8765, help='Port for uvicorn (default 8765)')
+
+    def handle(self, *args, **options):
+        upstream = FakeUpstream(options['delay'])
+        upstream.start()
+
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'smart_tourism_platform.settings'),
+            OPENWEATHER_API_URL=f'http://127.0.0.1:{upstream.port}/data/2.5/weather',
+            # Measure the view, not the quota guard
+            OPENWEATHER_RATE_LIMIT='0',
+        )
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'smart_tourism_platform.asgi:application',
+             '--port', str(options['port']), '--workers', '1', '--log-level', 'warning'],
+            cwd=settings.BASE_DIR,
+            env=env,
+        )
+        base_url = f'http://127.0.0.1:{options["port"]}'
+        try:
+            self._wait_for(base_url, server)
+            self.stdout.write(
+                f'Upstream delay {options["delay"]:.2f}s, one uvicorn worker\n'
+                f'{"clients":>8} {"wall s":>8} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"errors":>7}'
+            )
+            offset = 0
+            for clients in options['concurrency']:
+                wall, latencies, errors = asyncio.run(self._run(base_url, clients, offset))
+                offset += clients
+                latencies.sort()
+                p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)] if latencies else 0
+                self.stdout.write(
+                    f'{clients:>8} {wall:>8.2f} {clients / wall:>8.1f} '
+                    f'{statistics.median(latencies) * 1000 if latencies else 0:>8.0f} '
+                    f'{p95 * 1000:>8.0f} {errors:>7}'
+                )
+        finally:
+            server.terminate()
+            server.wait()
+            deleted, _ = PlaceWeatherCache.objects.filter(latitude__lt=BENCHMARK_LATITUDE + 1).delete()
+            self.stdout.write(self.style.SUCCESS(f'Done; removed {deleted} benchmark cache rows.'))
+
+    def _wait_for(self, base_url, server, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError('uvicorn exited; is it installed?')
+            try:
+                urllib.request.urlopen(base_url + '/api/search/suggestions/', timeout=1).close()
+                return
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.2)
+        raise CommandError('uvicorn did not start in time')
+
+    async def _run(self, base_url, clients, offset):
+        """Fire ``clients`` simultaneous requests for distinct, uncached points"""
+        connector = aiohttp.TCPConnector(limit=clients)
+        async with aiohttp.ClientSession(base_url, connector=connector) as session:
+            async def one(index):
+                latitude = BENCHMARK_LATITUDE + (offset + index) / 1_000_000
+                started = time.monotonic()
+                params = {'lat': f'{latitude:.6f}', 'lng': '77.0'}
+                async with session.get('/api/weather/', params=params) as response:
+                    await response.read()
+                    return time.monotonic() - started, response.status == 200
+
+            started = time.monotonic()
+            results = await asyncio.gather(*(one(index) for index in range(clients)), return_exceptions=True)
+            wall = time.monotonic() - started
+
+        latencies = [result[0] for result in results if isinstance(result, tuple) and result[1]]
+        return wall, latencies, len(results) - len(latencies)
@@ -0,0 +1,128 @@
+import gc
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from tourism.bitmap_index import destination_index
+from tourism.catalogue import catalogue
+from tourism.filters import DestinationFilter, category_exists
+from tourism.models import Category, Destination, State
+
+PAGE_SIZE = 12
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare memory and latency of the in-memory catalogue snapshot with the '
+        'equivalent ORM queries for listing, detail, suggestions and chatbot lookups'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help='Runs per operation (default 200)')
+        parser.add_argument('--query', default='ra', help='Suggestion / chatbot search text (default "ra")')
+
+    def handle(self, *args, **options):
+        if not Destination.objects.filter(is_active=True).exists():
+            raise CommandError('No active destinations; load some data first')
+
+        self.report_memory()
+
+        snapshot = catalogue.snapshot()
+        destination_index.snapshot()
+        slug = snapshot.destinations[len(snapshot) // 2].slug
+        query = options['query']
+        message = f'tell me about {snapshot.destinations[-1].name.lower()}'
+
+        operations = [
+            ('listing page', lambda: self.orm_listing(), lambda: destination_index.resolve(DestinationFilter())[:PAGE_SIZE]),
+            ('detail', lambda: self.orm_detail(slug), lambda: self.snapshot_detail(slug)),
+            ('suggestions', lambda: self.orm_suggestions(query), lambda: catalogue.snapshot().suggest(query)),
+            ('chatbot entities', lambda: self.orm_entities(message), lambda: self.snapshot_entities(message)),
+        ]
+        self.stdout.write(
+            f'\n{"operation":<18} {"ORM p50":>10} {"ORM p95":>10} {"snap p50":>10} {"snap p95":>10} {"speed-up":>9}'
+        )
+        for name, orm, snap in operations:
+            orm_p50, orm_p95 = self.time(orm, options['iterations'])
+            snap_p50, snap_p95 = self.time(snap, options['iterations'])
+            self.stdout.write(
+                f'{name:<18} {orm_p50 * 1e6:>8.0f}us {orm_p95 * 1e6:>8.0f}us '
+                f'{snap_p50 * 1e6:>8.1f}us {snap_p95 * 1e6:>8.1f}us {orm_p50 / snap_p50:>8.0f}x'
+            )
+        self.stdout.write(self.style.SUCCESS('Done.'))
+
+    def report_memory(self):
+        def measure(load):
+            gc.collect()
+            tracemalloc.start()
+            started = time.perf_counter()
+            value = load()
+            elapsed = time.perf_counter() - started
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            return value, size, elapsed
+
+        snapshot, snapshot_size, snapshot_time = measure(catalogue.build)
+        _, orm_size, orm_time = measure(lambda: list(
+            Destination.objects.filter(is_active=True).select_related('state').prefetch_related('categories')
+        ))
+        self.stdout.write(
+            f'{len(snapshot)} destinations, {len(snapshot.states)} states, {len(snapshot.categories)} categories\n'
+            f'{"":<18} {"memory":>10} {"load":>10}\n'
+            f'{"ORM instances":<18} {orm_size / 1024:>8.0f}KB {orm_time * 1000:>8.1f}ms\n'
+            f'{"snapshot":<18} {snapshot_size / 1024:>8.0f}KB {snapshot_time * 1000:>8.1f}ms'
+        )
+
+    def time(self, func, iterations):
+        func()
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings), statistics.quantiles(timings, n=20)[-1]
+
+    def orm_listing(self):
+        return list(Destination.objects.filter(
+            is_active=True
+        ).select_related('state').prefetch_related('categories')[:PAGE_SIZE])
+
+    def orm_detail(self, slug):
+        destination = Destination.objects.filter(
+            is_active=True
+        ).select_related('state').prefetch_related('categories').get(slug=slug)
+        return destination, list(Destination.objects.filter(
+            category_exists(category_id__in=[category.pk for category in destination.categories.all()]),
+            is_active=True
+        ).exclude(id=destination.id).select_related('state')[:4])
+
+    def snapshot_detail(self, slug):
+        snapshot = catalogue.snapshot()
+        destination = snapshot.by_slug[slug]
+        return destination, snapshot.similar(destination)
+
+    def orm_suggestions(self, query):
+        return (
+            list(Destination.objects.filter(
+                Q(name__icontains=query) | Q(city__icontains=query), is_active=True
+            ).values_list('name', flat=True)[:5]),
+            list(State.objects.filter(name__icontains=query).values_list('name', flat=True)[:3]),
+        )
+
+    def orm_entities(self, message):
+        return (
+            [dest.name for dest in Destination.objects.filter(is_active=True) if dest.name.lower() in message],
+            [cat.name for cat in Category.objects.all() if cat.name in message],
+            [state.name for state in State.objects.all() if state.name.lower() in message],
+        )
+
+    def snapshot_entities(self, message):
+        snapshot = catalogue.snapshot()
+        return (
+            [dest.name for dest in snapshot.destinations if dest.name_lower in message],
+            [cat.name for cat in snapshot.categories if cat.name in message],
+            [state.name for state in snapshot.states if state.name.lower() in message],
+        )
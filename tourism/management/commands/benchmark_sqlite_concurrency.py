@@ -0,0 +1,158 @@
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection, transaction
+from django.db.models import Avg, Count
+
+from chatbot.models import ChatMessage, ChatSession
+from tourism.models import Destination
+
+# Environment each profile's run is started with
+PROFILES = {
+    'default': {
+        'SQLITE_PROFILE': 'default',
+        'SQLITE_TRANSACTION_MODE': 'DEFERRED',
+        'CONN_MAX_AGE': '0',
+    },
+    'production': {
+        'SQLITE_PROFILE': 'production',
+        'SQLITE_TRANSACTION_MODE': 'IMMEDIATE',
+        'CONN_MAX_AGE': '600',
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare SQLite under the default and production connection profiles '
+        'with reader threads listing destinations while writer threads post chat '
+        'messages. Each profile runs in its own process against a copy of the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8, help='Reader threads (default 8)')
+        parser.add_argument('--writers', type=int, default=4, help='Writer threads (default 4)')
+        parser.add_argument('--duration', type=float, default=5, help='Seconds per profile (default 5)')
+        parser.add_argument(
+            '--profiles',
+            nargs='+',
+            choices=sorted(PROFILES),
+            default=['default', 'production'],
+            help='Profiles to run (default: default production)',
+        )
+        parser.add_argument('--worker', action='store_true', help='Internal: run one profile in this process')
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            self.stdout.write(json.dumps(self.run_workload(options)))
+            return
+
+        database = settings.DATABASES['default']
+        if database['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('The default database is not SQLite')
+
+        self.stdout.write(
+            f'{options["readers"]} readers, {options["writers"]} writers, {options["duration"]:.0f}s per profile\n'
+            f'{"profile":>10} {"reads/s":>9} {"writes/s":>9} {"read p95":>9} {"write p95":>10} {"errors":>7}'
+        )
+        for profile in options['profiles']:
+            result = self.run_profile(Path(database['NAME']), profile, options)
+            self.stdout.write(
+                f'{profile:>10} {result["reads"] / result["elapsed"]:>9.0f} '
+                f'{result["writes"] / result["elapsed"]:>9.0f} '
+                f'{result["read_p95"] * 1000:>7.1f}ms {result["write_p95"] * 1000:>8.1f}ms '
+                f'{result["errors"]:>7}'
+            )
+        self.stdout.write(self.style.SUCCESS('Done.'))
+
+    def run_profile(self, source, profile, options):
+        with tempfile.TemporaryDirectory() as directory:
+            copy = Path(directory) / 'benchmark.sqlite3'
+            # Start every profile from a rollback-journal copy; WAL mode is
+            # stored in the file and would otherwise leak between runs
+            with sqlite3.connect(source) as original, sqlite3.connect(copy) as target:
+                original.backup(target)
+                target.execute('PRAGMA journal_mode = DELETE')
+
+            env = dict(os.environ, SQLITE_PATH=str(copy), **PROFILES[profile])
+            completed = subprocess.run(
+                [sys.executable, 'manage.py', 'benchmark_sqlite_concurrency', '--worker',
+                 '--readers', str(options['readers']),
+                 '--writers', str(options['writers']),
+                 '--duration', str(options['duration'])],
+                cwd=settings.BASE_DIR,
+                env=env,
+                capture_output=True,
+                text=True,
+            )
+        if completed.returncode:
+            raise CommandError(f'{profile} run failed:\n{completed.stderr}')
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def run_workload(self, options):
+        session = ChatSession.objects.create(session_id=f'benchmark-{uuid.uuid4().hex}')
+        connection.close()
+
+        deadline = time.monotonic() + options['duration']
+        latencies = {'read': [], 'write': []}
+        errors = []
+        lock = threading.Lock()
+
+        def read():
+            list(Destination.objects.filter(is_active=True).select_related('state').prefetch_related('categories')[:20])
+            Destination.objects.aggregate(Avg('average_rating'), Count('id'))
+
+        def write():
+            with transaction.atomic():
+                ChatMessage.objects.create(session=session, message_type='user', message='benchmark')
+                ChatSession.objects.filter(pk=session.pk).update(is_active=True)
+
+        def loop(kind, operation):
+            timings = []
+            failures = 0
+            while time.monotonic() < deadline:
+                # Request boundaries: connections older than CONN_MAX_AGE are closed
+                close_old_connections()
+                started = time.monotonic()
+                try:
+                    operation()
+                    timings.append(time.monotonic() - started)
+                except OperationalError:
+                    failures += 1
+                close_old_connections()
+            connection.close()
+            with lock:
+                latencies[kind].extend(timings)
+                errors.append(failures)
+
+        threads = [threading.Thread(target=loop, args=('read', read)) for _ in range(options['readers'])]
+        threads += [threading.Thread(target=loop, args=('write', write)) for _ in range(options['writers'])]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        def p95(values):
+            return statistics.quantiles(values, n=20)[-1] if len(values) > 1 else sum(values)
+
+        return {
+            'elapsed': elapsed,
+            'reads': len(latencies['read']),
+            'writes': len(latencies['write']),
+            'read_p95': p95(latencies['read']),
+            'write_p95': p95(latencies['write']),
+            'errors': sum(errors),
+        }
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from tourism.tiles import MAX_TILE_ZOOM, tile_cache
+
+
+class Command(BaseCommand):
+    help = (
+        'Remove outdated destination vector tiles from the on-disk cache '
+        'and pre-build the current ones'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-zoom',
+            type=int,
+            default=8,
+            help=f'Deepest zoom level to build (0-{MAX_TILE_ZOOM}, default 8)',
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Remove all cached tiles before building',
+        )
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            tile_cache.clear()
+            self.stdout.write(self.style.WARNING('Cleared cached tiles.'))
+        else:
+            removed = tile_cache.prune()
+            self.stdout.write(f'Removed {removed} outdated tiles.')
+
+        built = tile_cache.prebuild(max_zoom=options['max_zoom'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Built {built} destination tiles up to zoom {options["max_zoom"]}.')
+        )
@@ -0,0 +1,53 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from tourism.catalogue import catalogue
+from tourism.models import UserRecommendation
+from tourism.recommendations import interactions, item_neighbours, recommender, store_neighbours
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute destination similarity and every user\'s recommendations, or '
+        'with --stale-only just the users whose interactions changed since and '
+        'users who have none yet. Run it nightly and the stale refresh every few '
+        'minutes; pages serve stored lists and never compute them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale-only', action='store_true',
+            help='Only refresh users marked stale or never computed, against the stored similarity'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Users per batch (default 1000)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        neighbours = None
+        if options['stale_only']:
+            user_ids = list(UserRecommendation.objects.filter(is_stale=True).values_list('user_id', flat=True))
+            user_ids += User.objects.filter(
+                is_active=True, userrecommendation__isnull=True
+            ).values_list('pk', flat=True)
+        else:
+            started = time.perf_counter()
+            user_weights = interactions()
+            destination_ids = [record.id for record in catalogue.snapshot().destinations]
+            neighbours = item_neighbours(user_weights, destination_ids, batch_size=batch_size)
+            store_neighbours(neighbours)
+            self.stdout.write(
+                f'Similarity for {len(destination_ids)} destinations over {len(user_weights)} users '
+                f'in {time.perf_counter() - started:.2f}s'
+            )
+            user_ids = list(User.objects.filter(is_active=True).values_list('pk', flat=True))
+
+        started = time.perf_counter()
+        for start in range(0, len(user_ids), batch_size):
+            recommender.refresh_users(user_ids[start:start + batch_size], neighbours)
+        elapsed = time.perf_counter() - started
+        per_user = elapsed / len(user_ids) * 1000 if user_ids else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed {len(user_ids)} users in {elapsed:.2f}s ({per_user:.2f}ms per user).'
+        ))
@@ -0,0 +1,114 @@
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from tourism import weather
+from tourism.models import Destination, PlaceWeatherCache, TripDestination
+
+# Points refreshed per batch weather lookup
+CHUNK_SIZE = 100
+
+
+class Command(BaseCommand):
+    help = (
+        'Prewarm cached weather for featured destinations and upcoming trip stops, '
+        'then purge expired weather rows. Meant to run from a scheduler (cron, '
+        'systemd timer) more often than the one-hour cache lifetime, e.g. every 30 minutes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=7,
+            help='Prewarm stops of trips happening within this many days (default 7)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.WEATHER_BATCH_CONCURRENCY,
+            help='OpenWeather requests in flight at once',
+        )
+        parser.add_argument(
+            '--max-wait',
+            type=float,
+            default=60,
+            help='Seconds a refresh may queue for OpenWeather rate budget (default 60)',
+        )
+        parser.add_argument(
+            '--retention-hours',
+            type=int,
+            default=24,
+            help='Delete rows cached longer ago than this (default 24)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows deleted per purge statement (default 1000)',
+        )
+        parser.add_argument('--skip-prewarm', action='store_true', help='Only purge expired rows')
+        parser.add_argument('--skip-purge', action='store_true', help='Only prewarm')
+
+    def handle(self, *args, **options):
+        if not options['skip_prewarm']:
+            self.prewarm(options)
+        if not options['skip_purge']:
+            self.purge(options)
+
+    def prewarm_points(self, days):
+        """Distinct coordinates of featured destinations and upcoming stops"""
+        today = timezone.localdate()
+        until = today + timedelta(days=days)
+
+        points = Destination.objects.filter(
+            is_active=True, featured=True, latitude__isnull=False, longitude__isnull=False
+        ).values_list('latitude', 'longitude')
+        stops = TripDestination.objects.filter(
+            Q(planned_date__range=(today, until))
+            | Q(planned_date__isnull=True, trip__start_date__range=(today, until)),
+            trip__is_active=True,
+            is_visited=False,
+        ).values_list('latitude', 'longitude')
+
+        return list(dict.fromkeys(
+            (float(latitude), float(longitude)) for latitude, longitude in [*points, *stops]
+        ))
+
+    def prewarm(self, options):
+        points = self.prewarm_points(options['days'])
+        ok = stale = failed = 0
+        for start in range(0, len(points), CHUNK_SIZE):
+            results = async_to_sync(weather.aweather_for_points)(
+                points[start:start + CHUNK_SIZE],
+                concurrency=options['concurrency'],
+                max_wait=options['max_wait'],
+            )
+            for result in results:
+                if not result['success']:
+                    failed += 1
+                elif result.get('stale'):
+                    stale += 1
+                else:
+                    ok += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Prewarmed weather for {len(points)} locations: {ok} fresh, {stale} stale, {failed} failed.'
+        ))
+
+    def purge(self, options):
+        cutoff = timezone.now() - timedelta(hours=options['retention_hours'])
+        expired = PlaceWeatherCache.objects.filter(cached_at__lt=cutoff)
+        purged = 0
+        # Delete in bounded batches so no single statement holds the write lock for long
+        while True:
+            ids = list(expired.values_list('pk', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            purged += PlaceWeatherCache.objects.filter(pk__in=ids).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} expired weather rows.'))
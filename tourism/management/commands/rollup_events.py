@@ -0,0 +1,77 @@
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import CharField, Count, F, Value
+from django.db.models.functions import Lower, TruncDate
+from django.utils import timezone
+
+from tourism.events import EVENT_MODELS, events
+from tourism.models import DailyEventCount
+
+# What each kind's daily counts are keyed on
+ROLLUP_KEYS = {
+    'view': F('destination_id'),
+    'search': Lower('query'),
+    'suggestion_click': F('suggestion'),
+    'map_open': Value('', output_field=CharField()),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Aggregate raw analytics events from before today into daily counts '
+        'per destination, search query and suggestion, then delete them. '
+        'Safe to rerun; run it daily.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-days', type=int, default=0,
+            help='Leave raw events from this many days before today in place (default 0)'
+        )
+
+    def handle(self, *args, **options):
+        events.flush()
+        today = timezone.localdate()
+        cutoff = timezone.make_aware(
+            datetime.combine(today - timedelta(days=options['keep_days']), time.min)
+        )
+
+        for kind, model in EVENT_MODELS.items():
+            with transaction.atomic():
+                raw = model.objects.filter(created_at__lt=cutoff)
+                counts = self.count(raw, ROLLUP_KEYS[kind])
+                self.store(kind, counts)
+                deleted, _ = raw.delete()
+            self.stdout.write(f'{kind}: {deleted} events into {len(counts)} daily counts')
+
+        self.stdout.write(self.style.SUCCESS(f'Rolled up events before {cutoff.date()}.'))
+
+    def count(self, queryset, key):
+        """``{(date, key): count}`` for ``queryset``"""
+        rows = queryset.annotate(
+            date=TruncDate('created_at'), rollup_key=key
+        ).values('date', 'rollup_key').annotate(count=Count('pk'))
+        return {(row['date'], str(row['rollup_key'])): row['count'] for row in rows}
+
+    def store(self, kind, counts):
+        """Add ``counts`` to the stored daily counts of ``kind``"""
+        if not counts:
+            return
+        existing = {
+            (row.date, row.key): row
+            for row in DailyEventCount.objects.select_for_update().filter(
+                kind=kind, date__in={date for date, _ in counts}
+            )
+        }
+        updated, created = [], []
+        for (date, key), count in counts.items():
+            row = existing.get((date, key))
+            if row is None:
+                created.append(DailyEventCount(date=date, kind=kind, key=key, count=count))
+            else:
+                row.count += count
+                updated.append(row)
+        DailyEventCount.objects.bulk_update(updated, ['count'], batch_size=500)
+        DailyEventCount.objects.bulk_create(created, batch_size=500)
@@ -0,0 +1,32 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the primary SQLite database into every SQLite read replica, standing '
+        'in for replication when trying replica routing locally. Run it after '
+        'migrations and whenever the replicas should catch up.'
+    )
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES['default']
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('The primary database is not SQLite')
+
+        replicas = [
+            alias for alias in settings.READ_REPLICAS
+            if settings.DATABASES[alias]['ENGINE'] == 'django.db.backends.sqlite3'
+        ]
+        if not replicas:
+            raise CommandError('No SQLite replicas configured; set DATABASE_REPLICAS')
+
+        with sqlite3.connect(primary['NAME']) as source:
+            for alias in replicas:
+                with sqlite3.connect(settings.DATABASES[alias]['NAME']) as target:
+                    source.backup(target)
+                self.stdout.write(f'{alias}: {settings.DATABASES[alias]["NAME"]}')
+
+        self.stdout.write(self.style.SUCCESS(f'Synced {len(replicas)} replicas.'))
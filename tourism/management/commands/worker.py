@@ -0,0 +1,78 @@
+import multiprocessing
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tourism import jobs
+from tourism.models import Job
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued background jobs (admin bulk actions) on a pool of worker '
+        'processes, one job at a time. Run one or more alongside the web '
+        'server; each polls the job table, so no broker is needed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=settings.JOBS_WORKER_PROCESSES,
+            help='Pool processes running chunks of a job in parallel'
+        )
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        worker = jobs.worker_name()
+        # Stop the same way on SIGTERM (systemd, docker stop) as on Ctrl-C
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        pool = self.make_pool(processes)
+        self.stdout.write(f'Worker {worker} running with {processes} processes')
+
+        job = None
+        try:
+            while True:
+                requeued = jobs.requeue_stale()
+                if requeued:
+                    self.stdout.write(f'Requeued {requeued} stale jobs')
+                job = jobs.claim_next(worker)
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(settings.JOBS_POLL_INTERVAL)
+                    continue
+
+                self.stdout.write(f'Job {job.pk}: {job.description} ({job.total} objects)')
+                started = time.perf_counter()
+                try:
+                    # Two chunks per process so none sits idle between updates
+                    status = jobs.run(job, pool, in_flight=processes * 2)
+                except BrokenProcessPool as exc:
+                    status = jobs.finish(job, 'failed', f'A worker process died: {exc}')
+                    pool.shutdown(cancel_futures=True)
+                    pool = self.make_pool(processes)
+                job = None
+                self.stdout.write(f'  {status or "taken by another worker"} in {time.perf_counter() - started:.1f}s')
+        except (KeyboardInterrupt, SystemExit):
+            if job is not None:
+                # Let another worker start it over rather than wait to go stale
+                jobs.requeue(Job.objects.filter(pk=job.pk, worker=job.worker, status='running'))
+                self.stdout.write(f'Requeued job {job.pk}')
+        finally:
+            pool.shutdown(cancel_futures=True)
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker} stopped.'))
+
+    def make_pool(self, processes):
+        # Fresh interpreters that set Django up themselves, rather than forks
+        # sharing this process's database connections
+        return ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        )
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Composite (category_id, destination_id) index on the auto-created
+    destination/category through table. It covers the EXISTS semi-joins
+    used by the listing filters and category pages, which probe the table
+    by category; the built-in unique index leads with destination_id.
+    """
+
+    dependencies = [
+        ("tourism", "0002_placeweathercache_trip_tripdestination"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX tourism_destcat_cat_dest_idx "
+                "ON tourism_destination_categories (category_id, destination_id);"
+            ),
+            reverse_sql="DROP INDEX tourism_destcat_cat_dest_idx;",
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourism', '0003_destination_categories_category_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlaceDetailsCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('place_id', models.CharField(max_length=200, unique=True)),
+                ('data', models.JSONField(default=dict)),
+                ('fetched_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NearbyPlacesCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cell', models.CharField(max_length=50)),
+                ('place_type', models.CharField(max_length=100)),
+                ('radius', models.PositiveIntegerField()),
+                ('places', models.JSONField(default=list)),
+                ('fetched_at', models.DateTimeField()),
+            ],
+            options={
+                'unique_together': {('cell', 'place_type', 'radius')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 02:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('tourism', '0004_place_caches'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DestinationSimilarity',
+            fields=[
+                ('destination', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='similarity', serialize=False, to='tourism.destination')),
+                ('neighbours', models.JSONField(default=list)),
+                ('computed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserRecommendation',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('destination_ids', models.JSONField(default=list)),
+                ('is_stale', models.BooleanField(db_index=True, default=False)),
+                ('computed_at', models.DateTimeField()),
+            ],
+        ),
+    ]
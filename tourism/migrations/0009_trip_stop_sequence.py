@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-19 02:17
+
+from django.db import migrations, models
+from django.db.models import IntegerField, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_stop_sequence(apps, schema_editor):
+    Trip = apps.get_model('tourism', 'Trip')
+    TripDestination = apps.get_model('tourism', 'TripDestination')
+    Trip.objects.update(stop_sequence=Coalesce(Subquery(
+        TripDestination.objects.filter(trip_id=OuterRef('pk')).order_by().values('trip_id')
+        .annotate(last=Max('order')).values('last'),
+        output_field=IntegerField(),
+    ), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourism', '0008_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='stop_sequence',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_stop_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 02:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourism', '0011_cache_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogueversion',
+            name='stats_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
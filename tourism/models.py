@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.urls import reverse
@@ -151,6 +152,8 @@ class Trip(models.Model):
     start_date = models.DateField(null=True, blank=True)
     end_date = models.DateField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    # Highest stop order handed out so far (see allocate_stop_orders)
+    stop_sequence = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -160,6 +163,23 @@ class Trip(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.name}"
     
+    @classmethod
+    def lock(cls, trip_id):
+        """Take the trip row's write lock until the surrounding transaction ends"""
+        cls.objects.filter(pk=trip_id).update(stop_sequence=F('stop_sequence'))
+    
+    @classmethod
+    def allocate_stop_orders(cls, trip_id, count=1):
+        """
+        Reserve ``count`` stop orders after the trip's last one; returns them
+        as a range. The increment locks the trip row until the surrounding
+        transaction ends, so concurrent adds get disjoint orders.
+        """
+        with transaction.atomic():
+            cls.objects.filter(pk=trip_id).update(stop_sequence=F('stop_sequence') + count)
+            last = cls.objects.filter(pk=trip_id).values_list('stop_sequence', flat=True).get()
+        return range(last - count + 1, last + 1)
+    
     def get_total_destinations(self):
         return self.tripdestination_set.count()
     
@@ -243,3 +263,170 @@ class PlaceWeatherCache(models.Model):
         """Check if weather data is less than 1 hour old"""
         from django.utils import timezone
         return (timezone.now() - self.cached_at).seconds < 3600
+
+
+class PlaceDetailsCache(models.Model):
+    """Google Places details response cached per place"""
+    place_id = models.CharField(max_length=200, unique=True)
+    data = models.JSONField(default=dict)
+    fetched_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"Place details {self.place_id}"
+
+
+class NearbyPlacesCache(models.Model):
+    """Google nearby-search results cached per location cell, type and radius"""
+    cell = models.CharField(max_length=50)
+    place_type = models.CharField(max_length=100)
+    radius = models.PositiveIntegerField()
+    places = models.JSONField(default=list)
+    fetched_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ['cell', 'place_type', 'radius']
+    
+    def __str__(self):
+        return f"Nearby {self.place_type} at {self.cell} ({self.radius}m)"
+
+
+class DestinationSimilarity(models.Model):
+    """Most similar destinations to one destination, precomputed for recommendations"""
+    destination = models.OneToOneField(
+        Destination, on_delete=models.CASCADE, primary_key=True, related_name='similarity'
+    )
+    neighbours = models.JSONField(default=list)  # [[destination_id, score], ...], best first
+    computed_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"Neighbours of {self.destination_id}"
+
+
+class UserRecommendation(models.Model):
+    """
+    A user's precomputed top destinations; stale rows keep being served
+    until ``build_recommendations --stale-only`` recomputes them
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+    destination_ids = models.JSONField(default=list)
+    is_stale = models.BooleanField(default=False, db_index=True)
+    computed_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"Recommendations for {self.user_id}"
+
+
+class TrendingCounter(models.Model):
+    """Weighted engagement with a destination during one time bucket"""
+    destination = models.ForeignKey(Destination, on_delete=models.CASCADE, related_name='trending_counters')
+    bucket = models.DateTimeField(db_index=True)  # Start of the bucket
+    score = models.FloatField(default=0)
+    
+    class Meta:
+        unique_together = ['destination', 'bucket']
+    
+    def __str__(self):
+        return f"{self.destination_id} @ {self.bucket}: {self.score}"
+
+
+class AnalyticsEvent(models.Model):
+    """
+    One raw analytics event. Each kind has its own table so the hot view
+    table stays narrow and every kind can be rolled up and pruned alone.
+    """
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        abstract = True
+
+
+class DestinationViewEvent(AnalyticsEvent):
+    destination = models.ForeignKey(Destination, on_delete=models.CASCADE, related_name='+')
+
+
+class SearchEvent(AnalyticsEvent):
+    query = models.CharField(max_length=200)
+    results = models.PositiveIntegerField(default=0)
+
+
+class SuggestionClickEvent(AnalyticsEvent):
+    suggestion = models.CharField(max_length=200)
+
+
+class MapOpenEvent(AnalyticsEvent):
+    pass
+
+
+class DailyEventCount(models.Model):
+    """Raw events rolled up per day, kind and key (destination ID, query or suggestion)"""
+    date = models.DateField()
+    kind = models.CharField(max_length=20)
+    key = models.CharField(max_length=200, blank=True)
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['date', 'kind', 'key']
+        ordering = ['-date', 'kind', '-count']
+    
+    def __str__(self):
+        return f"{self.date} {self.kind} {self.key}: {self.count}"
+
+
+class Job(models.Model):
+    """A bulk action queued for the ``worker`` command (see ``tourism.jobs``)"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    ]
+    ACTIVE_STATUSES = ('queued', 'running')
+    
+    task = models.CharField(max_length=100)
+    description = models.CharField(max_length=200)
+    params = models.JSONField(default=dict)
+    object_ids = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    cancel_requested = models.BooleanField(default=False)
+    worker = models.CharField(max_length=100, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.description} ({self.get_status_display()})"
+    
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+    
+    def get_progress_percentage(self):
+        if self.total == 0:
+            return 100 if not self.is_active else 0
+        return round((self.processed / self.total) * 100, 1)
+
+
+class CatalogueVersion(models.Model):
+    """
+    Single row bumped on every catalogue change so each worker knows to
+    rebuild; ``stats_version`` counts saves touching only review stats
+    """
+    version = models.PositiveBigIntegerField(default=0)
+    stats_version = models.PositiveBigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"Catalogue version {self.version}"
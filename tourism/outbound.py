@@ -0,0 +1,222 @@
+"""
+Guards for calls to third-party APIs.
+
+Every provider (OpenWeather, Google Places) gets a ``Provider`` that
+coalesces identical in-flight requests into one upstream call
+(single-flight) and spends from a token bucket sized by
+``OUTBOUND_RATE_LIMITS``. A caller that can't get a token within
+``OUTBOUND_MAX_WAIT`` seconds gets ``RateLimitExceeded`` and is expected
+to fall back to stale cached data. Budgets are per worker process.
+
+Async views use the same providers through ``Provider.acall`` and make
+their requests with ``aget_json`` on a shared aiohttp session.
+"""
+import asyncio
+import threading
+import time
+import weakref
+
+import aiohttp
+import requests
+from django.conf import settings
+
+# Network failures raised by ``aget_json``
+ASYNC_HTTP_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+
+
+class RateLimitExceeded(Exception):
+    """The provider's request budget is used up for now"""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run one call per key at a time; concurrent callers share its outcome"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class AsyncSingleFlight:
+    """
+    ``SingleFlight`` for coroutines running on the same event loop. The
+    call runs as its own task, so cancelling the caller that started it
+    (say, a client disconnecting) leaves the others waiting on the result.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, func):
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key)
+        task = self._calls.get(flight_key)
+        if task is None:
+            task = self._calls[flight_key] = loop.create_task(func())
+            task.add_done_callback(lambda done: self._finished(flight_key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, flight_key, task):
+        if self._calls.get(flight_key) is task:
+            del self._calls[flight_key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved when every caller has gone
+
+
+class TokenBucket:
+    """``rate`` tokens per second, holding at most ``burst``"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self):
+        """Take a token; returns 0, or the seconds until one is available"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, timeout=0):
+        """Take a token, waiting up to ``timeout`` seconds; False if none came"""
+        deadline = time.monotonic() + timeout
+        while wait := self._take():
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+        return True
+
+    async def aacquire(self, timeout=0):
+        deadline = time.monotonic() + timeout
+        while wait := self._take():
+            if time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+        return True
+
+
+class Provider:
+    """Single-flight and rate limiting for one upstream API"""
+
+    def __init__(self, name, rate, burst, max_wait):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.max_wait = max_wait
+        self.flights = SingleFlight()
+        self.async_flights = AsyncSingleFlight()
+
+    def call(self, key, func, max_wait=None):
+        """
+        Return ``func()``, sharing it with identical concurrent calls;
+        ``max_wait`` overrides how long to queue for budget.
+        """
+        return self.flights.do(key, lambda: self._limited(func, max_wait))
+
+    def _limited(self, func, max_wait):
+        max_wait = self.max_wait if max_wait is None else max_wait
+        if self.bucket is not None and not self.bucket.acquire(max_wait):
+            raise RateLimitExceeded(f'{self.name} rate limit reached')
+        return func()
+
+    async def acall(self, key, func, max_wait=None):
+        """Async ``call``; ``func`` returns an awaitable"""
+        return await self.async_flights.do(key, lambda: self._alimited(func, max_wait))
+
+    async def _alimited(self, func, max_wait):
+        max_wait = self.max_wait if max_wait is None else max_wait
+        if self.bucket is not None and not await self.bucket.aacquire(max_wait):
+            raise RateLimitExceeded(f'{self.name} rate limit reached')
+        return await func()
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def provider(name):
+    """The shared ``Provider`` configured for ``name``"""
+    with _providers_lock:
+        if name not in _providers:
+            limits = getattr(settings, 'OUTBOUND_RATE_LIMITS', {}).get(name, {})
+            _providers[name] = Provider(
+                name,
+                rate=limits.get('rate'),
+                burst=limits.get('burst', 1),
+                max_wait=getattr(settings, 'OUTBOUND_MAX_WAIT', 2.0),
+            )
+        return _providers[name]
+
+
+def get_json(url, params):
+    """GET ``url``; returns the status code and the JSON body of a 200"""
+    response = requests.get(url, params=params, timeout=10)
+    return response.status_code, response.json() if response.status_code == 200 else None
+
+
+_async_sessions = weakref.WeakKeyDictionary()
+
+
+def _new_session():
+    connector = aiohttp.TCPConnector(limit=getattr(settings, 'OUTBOUND_MAX_CONNECTIONS', 500))
+    return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=10))
+
+
+async def _get_json(session, url, params):
+    params = {key: str(value) for key, value in params.items()}
+    async with session.get(url, params=params) as response:
+        if response.status != 200:
+            return response.status, None
+        return response.status, await response.json(content_type=None)
+
+
+async def aget_json(url, params):
+    """Async ``get_json``"""
+    if threading.current_thread() is threading.main_thread():
+        # The server's event loop: share one pooled session for its lifetime
+        loop = asyncio.get_running_loop()
+        session = _async_sessions.get(loop)
+        if session is None or session.closed:
+            session = _async_sessions[loop] = _new_session()
+        return await _get_json(session, url, params)
+
+    # async_to_sync (e.g. under a WSGI server) runs each call on a fresh loop
+    # in a worker thread, which a pooled session would outlive
+    async with _new_session() as session:
+        return await _get_json(session, url, params)
@@ -0,0 +1,228 @@
+"""
+Pagination helpers for destination listings.
+
+Two modes are offered to list views through ``CursorPaginationMixin``:
+
+* the usual page-number mode, backed by ``CachedCountPaginator`` so the
+  ``COUNT(*)`` over a filtered queryset is only run once per cache window;
+* a keyset ("cursor") mode, enabled by a ``cursor`` query parameter, which
+  seeks on the active ordering columns instead of using ``OFFSET``.
+"""
+import hashlib
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ImproperlyConfigured
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+CURSOR_SALT = 'tourism.pagination.cursor'
+
+
+def cached_count(queryset, timeout=None):
+    """Return ``queryset.count()``, cached by the SQL it would run."""
+    if timeout is None:
+        timeout = getattr(settings, 'PAGINATION_COUNT_CACHE_TIMEOUT', 300)
+    if not timeout:
+        return queryset.count()
+
+    try:
+        sql, params = queryset.order_by().query.sql_with_params()
+    except EmptyResultSet:
+        # .none() and lookups like pk__in=[] can match nothing without a query
+        return 0
+    digest = hashlib.md5(f'{sql}|{params!r}'.encode()).hexdigest()
+    key = f'tourism:count:{queryset.model._meta.label_lower}:{digest}'
+
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, timeout)
+    return count
+
+
+class CachedCountPaginator(Paginator):
+    """Page-number paginator whose total count comes from the cache"""
+
+    @cached_property
+    def count(self):
+        if hasattr(self.object_list, 'query'):
+            return cached_count(self.object_list)
+        return super().count
+
+
+def _encode_value(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _resolve(obj, field):
+    for part in field.split('__'):
+        obj = getattr(obj, part)
+    return obj
+
+
+class CursorPage:
+    """A single keyset page; mirrors the parts of ``Page`` templates use"""
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self.object_list)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Keyset paginator seeking on the queryset's ordering.
+
+    The ordering is taken from the queryset (falling back to the model's
+    ``Meta.ordering``) and ``pk`` is appended as a tie-breaker, e.g.
+    ``-featured, -average_rating, name, pk`` for destinations. Only plain
+    field names are supported and the columns must not be nullable.
+    Cursors are signed so they are opaque to clients and can't be forged.
+    """
+
+    def __init__(self, object_list, per_page):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = self._get_ordering(object_list)
+
+    @staticmethod
+    def _get_ordering(queryset):
+        query = queryset.query
+        ordering = list(query.order_by or (query.get_meta().ordering if query.default_ordering else []))
+        fields = []
+        for item in ordering:
+            if not isinstance(item, str) or item.startswith('?'):
+                raise ImproperlyConfigured(
+                    'CursorPaginator only supports ordering by field names, got %r.' % (item,)
+                )
+            fields.append((item.lstrip('-'), item.startswith('-')))
+        if not any(name in ('pk', 'id') for name, _ in fields):
+            fields.append(('pk', False))
+        return fields
+
+    @cached_property
+    def fingerprint(self):
+        return ','.join(('-' if desc else '') + name for name, desc in self.ordering)
+
+    @cached_property
+    def count(self):
+        """Total number of objects, served from the count cache"""
+        return cached_count(self.object_list)
+
+    def encode_cursor(self, obj, backwards=False):
+        values = [_encode_value(_resolve(obj, name)) for name, _ in self.ordering]
+        payload = {'o': self.fingerprint, 'v': values}
+        if backwards:
+            payload['b'] = 1
+        return signing.dumps(payload, salt=CURSOR_SALT, compress=True)
+
+    def decode_cursor(self, cursor):
+        """Return ``(values, backwards)``; ``(None, False)`` for the first page"""
+        if not cursor:
+            return None, False
+        try:
+            payload = signing.loads(cursor, salt=CURSOR_SALT)
+        except signing.BadSignature:
+            raise Http404('Invalid cursor')
+        # A cursor minted for another sort order points nowhere useful
+        if payload.get('o') != self.fingerprint:
+            return None, False
+        return payload['v'], bool(payload.get('b'))
+
+    def _seek(self, values, backwards):
+        """Build the ``(a, b, c) > (x, y, z)`` row comparison as OR-ed terms"""
+        condition = Q()
+        for index, (name, desc) in enumerate(self.ordering):
+            lookup = 'lt' if desc != backwards else 'gt'
+            term = Q(**{f'{name}__{lookup}': values[index]})
+            for prev_index, (prev_name, _) in enumerate(self.ordering[:index]):
+                term &= Q(**{prev_name: values[prev_index]})
+            condition |= term
+        return condition
+
+    def page(self, cursor=None):
+        values, backwards = self.decode_cursor(cursor)
+        queryset = self.object_list
+
+        if backwards:
+            queryset = queryset.order_by(*[
+                ('' if desc else '-') + name for name, desc in self.ordering
+            ])
+        else:
+            queryset = queryset.order_by(*[
+                ('-' if desc else '') + name for name, desc in self.ordering
+            ])
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, backwards))
+
+        items = list(queryset[:self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+
+        if backwards:
+            items.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        next_cursor = previous_cursor = None
+        if items:
+            if has_next:
+                next_cursor = self.encode_cursor(items[-1])
+            if has_previous:
+                previous_cursor = self.encode_cursor(items[0], backwards=True)
+        return CursorPage(items, self, next_cursor, previous_cursor)
+
+
+class CursorPaginationMixin:
+    """
+    ListView mixin adding cursor pagination next to page numbers.
+
+    Requests carrying ``?cursor=`` (empty for the first page) are served by
+    ``CursorPaginator``; everything else keeps page-number links but with a
+    cached total count.
+    """
+    paginator_class = CachedCountPaginator
+    cursor_paginator_class = CursorPaginator
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.cursor_query_param not in self.request.GET:
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = self.cursor_paginator_class(queryset, page_size)
+        page = paginator.page(self.request.GET.get(self.cursor_query_param))
+        return (paginator, page, page.object_list, page.has_other_pages())
@@ -0,0 +1,329 @@
+"""
+Cached access to the Google Places API.
+
+Place details are cached per ``place_id`` and nearby searches per
+(location cell, type, radius), each in two tiers: a per-process LRU in
+front of a database table shared by every worker. Entries older than the
+configured TTL are still served while a background thread refreshes them,
+so only a cold miss waits for Google. Upstream requests go through the
+``google_places`` provider in ``tourism.outbound``.
+"""
+import logging
+import math
+import threading
+from abc import ABC, abstractmethod
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .lru import LRUCache
+from .models import NearbyPlacesCache, PlaceDetailsCache
+from .outbound import RateLimitExceeded, aget_json, get_json, provider
+
+logger = logging.getLogger(__name__)
+
+DETAILS_FIELDS = 'name,formatted_address,formatted_phone_number,website,opening_hours,rating,user_ratings_total,price_level,photos'
+NEARBY_RESULTS = 10
+
+
+class PlacesAPIError(Exception):
+    """Google Places answered with an error"""
+
+
+def api_key_configured():
+    api_key = settings.GOOGLE_MAPS_API_KEY
+    return bool(api_key) and api_key != 'YOUR_GOOGLE_MAPS_API_KEY'
+
+
+def _details_params(place_id):
+    return {
+        'place_id': place_id,
+        'fields': DETAILS_FIELDS,
+        'key': settings.GOOGLE_MAPS_API_KEY,
+    }
+
+
+def _parse_details(status, data):
+    if status != 200:
+        raise PlacesAPIError('Google Places API request failed')
+    if data.get('status') != 'OK':
+        raise PlacesAPIError(f'Places API error: {data.get("status")}')
+
+    result = data.get('result', {})
+    return {
+        'name': result.get('name', 'Unknown Place'),
+        'address': result.get('formatted_address', 'Address not available'),
+        'phone': result.get('formatted_phone_number', ''),
+        'website': result.get('website', ''),
+        'opening_hours': result.get('opening_hours', {}).get('weekday_text', []),
+        'rating': result.get('rating', 0),
+        'reviews_count': result.get('user_ratings_total', 0),
+        'price_level': result.get('price_level', 0),
+    }
+
+
+def _nearby_params(latitude, longitude, place_type, radius):
+    return {
+        'location': f'{latitude},{longitude}',
+        'radius': radius,
+        'type': place_type,
+        'key': settings.GOOGLE_MAPS_API_KEY,
+    }
+
+
+def _parse_nearby(status, data):
+    if status != 200:
+        raise PlacesAPIError('Google Places API error')
+    if data.get('status') not in ('OK', 'ZERO_RESULTS'):
+        raise PlacesAPIError(f'Places API error: {data.get("status")}')
+
+    return [
+        {
+            'name': place.get('name', 'Unknown'),
+            'type': place.get('types', [''])[0] if place.get('types') else '',
+            'rating': place.get('rating', 0),
+            'vicinity': place.get('vicinity', ''),
+            'place_id': place.get('place_id', ''),
+            'price_level': place.get('price_level', 0),
+            'is_open': place.get('opening_hours', {}).get('open_now', None),
+        }
+        for place in data.get('results', [])[:NEARBY_RESULTS]
+    ]
+
+
+def fetch_place_details(place_id):
+    """Request and format the details of one place"""
+    url = f'{settings.GOOGLE_PLACES_API_URL}/details/json'
+    return _parse_details(*get_json(url, _details_params(place_id)))
+
+
+async def afetch_place_details(place_id):
+    url = f'{settings.GOOGLE_PLACES_API_URL}/details/json'
+    return _parse_details(*await aget_json(url, _details_params(place_id)))
+
+
+def fetch_nearby_places(latitude, longitude, place_type, radius):
+    """Request and format a nearby search around a point"""
+    url = f'{settings.GOOGLE_PLACES_API_URL}/nearbysearch/json'
+    params = _nearby_params(latitude, longitude, place_type, radius)
+    return _parse_nearby(*get_json(url, params))
+
+
+async def afetch_nearby_places(latitude, longitude, place_type, radius):
+    url = f'{settings.GOOGLE_PLACES_API_URL}/nearbysearch/json'
+    params = _nearby_params(latitude, longitude, place_type, radius)
+    return _parse_nearby(*await aget_json(url, params))
+
+
+def nearby_cell(latitude, longitude):
+    """Key of the grid cell containing a point"""
+    size = settings.PLACES_NEARBY_CELL_SIZE
+    return f'{math.floor(latitude / size)}:{math.floor(longitude / size)}'
+
+
+def cell_centre(cell):
+    size = settings.PLACES_NEARBY_CELL_SIZE
+    row, column = (int(value) for value in cell.split(':'))
+    return round((row + 0.5) * size, 6), round((column + 0.5) * size, 6)
+
+
+class CachedLookup(ABC):
+    """
+    Memory + database cache around one kind of Places request.
+
+    Subclasses implement the abstract ``load``/``store`` for their table
+    and ``fetch`` for the API call, plus ``aload``/``astore``/``afetch``
+    for async callers; cached values are ``(value, fetched_at)`` pairs. Stale entries
+    are refreshed on a thread either way.
+    """
+    ttl_setting = None
+
+    def __init__(self):
+        self.memory = LRUCache(settings.PLACES_MEMORY_CACHE_SIZE)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        return timedelta(seconds=getattr(settings, self.ttl_setting))
+
+    @abstractmethod
+    def load(self, key):
+        """Stored ``(value, fetched_at)`` for ``key``, or None"""
+
+    @abstractmethod
+    def store(self, key, value, fetched_at):
+        """Save a fetched value to the shared table"""
+
+    @abstractmethod
+    def fetch(self, key):
+        """Request ``key`` from the API"""
+
+    @abstractmethod
+    async def aload(self, key):
+        """Async ``load``"""
+
+    @abstractmethod
+    async def astore(self, key, value, fetched_at):
+        """Async ``store``"""
+
+    @abstractmethod
+    async def afetch(self, key):
+        """Async ``fetch``"""
+
+    def is_stale(self, fetched_at):
+        return timezone.now() - fetched_at > self.ttl
+
+    def get(self, key):
+        """Cached value for ``key``, fetching it on a miss"""
+        entry = self.memory.get(key)
+        if entry is None:
+            entry = self.load(key)
+            if entry is not None:
+                self.memory.set(key, entry)
+        if entry is None:
+            return self.refresh(key)
+
+        value, fetched_at = entry
+        if self.is_stale(fetched_at):
+            self.refresh_in_background(key)
+        return value
+
+    async def aget(self, key):
+        entry = self.memory.get(key)
+        if entry is None:
+            entry = await self.aload(key)
+            if entry is not None:
+                self.memory.set(key, entry)
+        if entry is None:
+            return await self.arefresh(key)
+
+        value, fetched_at = entry
+        if self.is_stale(fetched_at):
+            self.refresh_in_background(key)
+        return value
+
+    def refresh(self, key):
+        """Fetch and store ``key``; concurrent refreshes share one request"""
+        return provider('google_places').call((type(self).__name__, key), lambda: self._refresh(key))
+
+    def _refresh(self, key):
+        value = self.fetch(key)
+        fetched_at = timezone.now()
+        self.store(key, value, fetched_at)
+        self.memory.set(key, (value, fetched_at))
+        return value
+
+    async def arefresh(self, key):
+        return await provider('google_places').acall((type(self).__name__, key), lambda: self._arefresh(key))
+
+    async def _arefresh(self, key):
+        value = await self.afetch(key)
+        fetched_at = timezone.now()
+        await self.astore(key, value, fetched_at)
+        self.memory.set(key, (value, fetched_at))
+        return value
+
+    def refresh_in_background(self, key):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        threading.Thread(target=self._background_refresh, args=(key,), daemon=True).start()
+
+    def _background_refresh(self, key):
+        try:
+            # Another worker may have refreshed the shared row already
+            entry = self.load(key)
+            if entry is not None and not self.is_stale(entry[1]):
+                self.memory.set(key, entry)
+            else:
+                self.refresh(key)
+        except (PlacesAPIError, RateLimitExceeded, requests.RequestException) as e:
+            logger.warning('Background refresh of %s failed: %s', key, e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+            connection.close()
+
+
+class PlaceDetailsLookup(CachedLookup):
+    """Place details keyed by ``place_id``"""
+    ttl_setting = 'PLACES_DETAILS_TTL'
+
+    def load(self, place_id):
+        return PlaceDetailsCache.objects.filter(place_id=place_id).values_list('data', 'fetched_at').first()
+
+    def store(self, place_id, value, fetched_at):
+        PlaceDetailsCache.objects.update_or_create(
+            place_id=place_id, defaults={'data': value, 'fetched_at': fetched_at}
+        )
+
+    def fetch(self, place_id):
+        return fetch_place_details(place_id)
+
+    async def aload(self, place_id):
+        return await PlaceDetailsCache.objects.filter(place_id=place_id).values_list('data', 'fetched_at').afirst()
+
+    async def astore(self, place_id, value, fetched_at):
+        await PlaceDetailsCache.objects.aupdate_or_create(
+            place_id=place_id, defaults={'data': value, 'fetched_at': fetched_at}
+        )
+
+    async def afetch(self, place_id):
+        return await afetch_place_details(place_id)
+
+
+class NearbyPlacesLookup(CachedLookup):
+    """Nearby searches keyed by ``(cell, place_type, radius)``"""
+    ttl_setting = 'PLACES_NEARBY_TTL'
+
+    def load(self, key):
+        cell, place_type, radius = key
+        return NearbyPlacesCache.objects.filter(
+            cell=cell, place_type=place_type, radius=radius
+        ).values_list('places', 'fetched_at').first()
+
+    def store(self, key, value, fetched_at):
+        cell, place_type, radius = key
+        NearbyPlacesCache.objects.update_or_create(
+            cell=cell, place_type=place_type, radius=radius,
+            defaults={'places': value, 'fetched_at': fetched_at},
+        )
+
+    def fetch(self, key):
+        cell, place_type, radius = key
+        latitude, longitude = cell_centre(cell)
+        return fetch_nearby_places(latitude, longitude, place_type, radius)
+
+    async def aload(self, key):
+        cell, place_type, radius = key
+        return await NearbyPlacesCache.objects.filter(
+            cell=cell, place_type=place_type, radius=radius
+        ).values_list('places', 'fetched_at').afirst()
+
+    async def astore(self, key, value, fetched_at):
+        cell, place_type, radius = key
+        await NearbyPlacesCache.objects.aupdate_or_create(
+            cell=cell, place_type=place_type, radius=radius,
+            defaults={'places': value, 'fetched_at': fetched_at},
+        )
+
+    async def afetch(self, key):
+        cell, place_type, radius = key
+        latitude, longitude = cell_centre(cell)
+        return await afetch_nearby_places(latitude, longitude, place_type, radius)
+
+    def search(self, latitude, longitude, place_type, radius):
+        """Places of ``place_type`` around the centre of the point's cell"""
+        return self.get((nearby_cell(latitude, longitude), place_type, int(radius)))
+
+    async def asearch(self, latitude, longitude, place_type, radius):
+        return await self.aget((nearby_cell(latitude, longitude), place_type, int(radius)))
+
+
+place_details = PlaceDetailsLookup()
+nearby_places = NearbyPlacesLookup()
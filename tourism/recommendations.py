@@ -0,0 +1,279 @@
+"""
+Personalised destination recommendations.
+
+Offline, ``item_neighbours`` turns every user's wishlist, reviews and trip
+stops into a sparse weighted user-by-destination matrix and computes
+cosine item-item similarity from its sparse ``X.T @ X`` with NumPy, so
+time and memory follow the number of co-occurring destination pairs
+rather than users times destinations squared. Each destination's
+closest ``RECOMMENDATIONS_NEIGHBOURS`` are stored in
+``DestinationSimilarity`` (see the ``build_recommendations`` command).
+
+A user's list scores candidates by their similarity to what the user
+interacted with, boosts categories from
+``UserProfile.favorite_travel_types``, and fills cold starts from those
+categories in catalogue order. Lists are stored in ``UserRecommendation``
+and kept in a per-process LRU. Interaction signals mark a user's list
+stale (see ``tourism.signals``) and ``build_recommendations --stale-only``
+recomputes those users from the neighbour table. Reads never compute or
+write: until then they serve the stale list, or the catalogue's top
+destinations for users without one.
+"""
+from collections import defaultdict
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import UserProfile
+
+from .catalogue import catalogue
+from .lru import LRUCache
+from .models import DestinationSimilarity, Review, TripDestination, UserRecommendation, Wishlist
+
+WISHLIST_WEIGHT = 3.0
+TRIP_STOP_WEIGHT = 2.0
+# Reviews count by rating; places rated 1-2 stars add nothing
+REVIEW_WEIGHTS = {5: 4.0, 4: 3.0, 3: 1.0}
+# Score multiplier for destinations in a favourite travel type
+PREFERENCE_BOOST = 1.5
+
+
+def interactions(user_ids=None):
+    """``{user_id: {destination_id: weight}}`` from wishlists, reviews and trip stops"""
+    wishlists = Wishlist.objects.all()
+    reviews = Review.objects.all()
+    stops = TripDestination.objects.filter(destination__isnull=False)
+    if user_ids is not None:
+        wishlists = wishlists.filter(user_id__in=user_ids)
+        reviews = reviews.filter(user_id__in=user_ids)
+        stops = stops.filter(trip__user_id__in=user_ids)
+
+    result = defaultdict(lambda: defaultdict(float))
+    for user_id, destination_id in wishlists.values_list('user_id', 'destination_id'):
+        result[user_id][destination_id] += WISHLIST_WEIGHT
+    for user_id, destination_id, rating in reviews.values_list('user_id', 'destination_id', 'rating'):
+        result[user_id][destination_id] += REVIEW_WEIGHTS.get(rating, 0.0)
+    for user_id, destination_id in stops.values_list('trip__user_id', 'destination_id'):
+        result[user_id][destination_id] += TRIP_STOP_WEIGHT
+    return {user_id: dict(weights) for user_id, weights in result.items()}
+
+
+def _co_occurrences(user_weights, index, batch_size):
+    """
+    Per batch of users, the nonzero entries of ``X.T @ X`` for the sparse
+    user-by-destination matrix ``X``: ``(keys, values)`` with each key
+    ``row * count + column``. Each user adds the products of their own
+    interactions, so cost follows interactions, never destinations.
+    """
+    count = len(index)
+    users = list(user_weights.values())
+    for start in range(0, len(users), batch_size):
+        keys, values = [], []
+        for weights in users[start:start + batch_size]:
+            items = [
+                (index[destination_id], weight)
+                for destination_id, weight in weights.items() if weight and destination_id in index
+            ]
+            if not items:
+                continue
+            columns = np.array([column for column, _ in items], dtype=np.int64)
+            weight = np.array([weight for _, weight in items], dtype=np.float64)
+            keys.append((columns[:, None] * count + columns[None, :]).ravel())
+            values.append(np.outer(weight, weight).ravel())
+        if keys:
+            yield np.concatenate(keys), np.concatenate(values)
+
+
+def _sum_by_key(keys, values):
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return unique, np.bincount(inverse, weights=values, minlength=len(unique))
+
+
+def item_neighbours(user_weights, destination_ids, neighbours=None, batch_size=1024):
+    """
+    Cosine similarity between destinations over ``user_weights``.
+
+    Returns ``{destination_id: [[other_id, score], ...]}`` with the best
+    ``neighbours`` positive scores per destination, best first.
+    """
+    neighbours = neighbours or settings.RECOMMENDATIONS_NEIGHBOURS
+    count = len(destination_ids)
+    index = {destination_id: column for column, destination_id in enumerate(destination_ids)}
+
+    # Sparse X.T @ X: summed within each batch of users, and folded into the
+    # running totals once the pending sums outgrow them
+    keys, totals = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    pending, pending_size = [], 0
+
+    def fold():
+        return _sum_by_key(
+            np.concatenate([keys] + [batch_keys for batch_keys, _ in pending]),
+            np.concatenate([totals] + [batch_values for _, batch_values in pending]),
+        )
+
+    for batch in _co_occurrences(user_weights, index, batch_size):
+        pending.append(_sum_by_key(*batch))
+        pending_size += len(pending[-1][0])
+        if pending_size > max(len(keys), 1 << 20):
+            keys, totals = fold()
+            pending, pending_size = [], 0
+    keys, totals = fold()
+
+    # Keys are sorted, so each destination's row is one contiguous slice, and
+    # its diagonal entry (key row * (count + 1)) is its squared norm
+    bounds = np.searchsorted(keys, np.arange(count + 1, dtype=np.int64) * count)
+    diagonal = keys % (count + 1) == 0
+    norms = np.zeros(count, dtype=np.float64)
+    norms[keys[diagonal] // (count + 1)] = np.sqrt(totals[diagonal])
+
+    result = {}
+    for row, destination_id in enumerate(destination_ids):
+        start, end = bounds[row], bounds[row + 1]
+        columns = keys[start:end] - row * count
+        others = columns != row
+        columns = columns[others]
+        similarity = totals[start:end][others] / (norms[row] * norms[columns])
+        top = np.arange(len(columns))
+        if len(top) > neighbours:
+            top = np.argpartition(-similarity, neighbours - 1)[:neighbours]
+        # Best first; ties keep catalogue order
+        top = top[np.lexsort((columns[top], -similarity[top]))]
+        result[destination_id] = [
+            [destination_ids[column], round(float(score), 4)]
+            for column, score in zip(columns[top], similarity[top]) if score > 0
+        ]
+    return result
+
+
+def store_neighbours(neighbours):
+    """Replace the neighbour table with ``item_neighbours`` output"""
+    now = timezone.now()
+    with transaction.atomic():
+        DestinationSimilarity.objects.all().delete()
+        DestinationSimilarity.objects.bulk_create(
+            [
+                DestinationSimilarity(destination_id=destination_id, neighbours=ranked, computed_at=now)
+                for destination_id, ranked in neighbours.items()
+            ],
+            batch_size=500,
+        )
+
+
+def load_neighbours(destination_ids):
+    return dict(DestinationSimilarity.objects.filter(
+        destination_id__in=destination_ids
+    ).values_list('destination_id', 'neighbours'))
+
+
+def favourite_types(user_ids):
+    return {
+        user_id: set(types or ())
+        for user_id, types in UserProfile.objects.filter(
+            user_id__in=user_ids
+        ).values_list('user_id', 'favorite_travel_types')
+    }
+
+
+def rank_destinations(weights, favourites, neighbours, snapshot, size):
+    """Top ``size`` destination IDs for one user's interactions and favourite types"""
+    def preferred(record):
+        return any(category.name in favourites for category in record.categories)
+
+    scores = defaultdict(float)
+    for destination_id, weight in weights.items():
+        for other_id, similarity in neighbours.get(destination_id, ()):
+            scores[other_id] += weight * similarity
+
+    ranked = []
+    for destination_id, score in scores.items():
+        record = snapshot.by_id.get(destination_id)
+        if record is None or destination_id in weights:
+            continue
+        if favourites and preferred(record):
+            score *= PREFERENCE_BOOST
+        ranked.append((-score, record.rank, destination_id))
+    ranked.sort()
+    chosen = [destination_id for _, _, destination_id in ranked[:size]]
+
+    # Cold start and top-up: favourite types first, then everything, in catalogue order
+    if len(chosen) < size:
+        seen = set(chosen) | set(weights)
+        favourite_records = (record for record in snapshot.destinations if favourites and preferred(record))
+        for record in chain(favourite_records, snapshot.destinations):
+            if record.id not in seen:
+                chosen.append(record.id)
+                seen.add(record.id)
+                if len(chosen) == size:
+                    break
+    return chosen
+
+
+class Recommender:
+    """Serves users' stored lists through an LRU"""
+
+    def __init__(self):
+        self.memory = LRUCache(
+            settings.RECOMMENDATIONS_MEMORY_CACHE_SIZE, ttl=settings.RECOMMENDATIONS_MEMORY_TTL
+        )
+
+    def for_user(self, user, limit=None):
+        """Recommended catalogue records for ``user``, best first"""
+        snapshot = catalogue.snapshot()
+        ids = self.memory.get(user.pk)
+        if ids is None:
+            ids = UserRecommendation.objects.filter(
+                user_id=user.pk
+            ).values_list('destination_ids', flat=True).first()
+            if ids is None:
+                # Not computed yet: the command picks the user up on its next run
+                ids = [record.id for record in snapshot.destinations[:settings.RECOMMENDATIONS_PER_USER]]
+            self.memory.set(user.pk, ids)
+
+        by_id = snapshot.by_id
+        records = [by_id[destination_id] for destination_id in ids if destination_id in by_id]
+        return records[:limit] if limit else records
+
+    def refresh_users(self, user_ids, neighbours=None):
+        """
+        Recompute and store the lists of ``user_ids``; returns them by user.
+        ``neighbours`` defaults to the rows of the destinations involved.
+        """
+        snapshot = catalogue.snapshot()
+        user_weights = interactions(user_ids)
+        if neighbours is None:
+            neighbours = load_neighbours({
+                destination_id for weights in user_weights.values() for destination_id in weights
+            })
+        favourites = favourite_types(user_ids)
+        size = settings.RECOMMENDATIONS_PER_USER
+
+        now = timezone.now()
+        lists = {
+            user_id: rank_destinations(
+                user_weights.get(user_id, {}), favourites.get(user_id, set()), neighbours, snapshot, size
+            )
+            for user_id in user_ids
+        }
+        UserRecommendation.objects.bulk_create(
+            [
+                UserRecommendation(user_id=user_id, destination_ids=ids, is_stale=False, computed_at=now)
+                for user_id, ids in lists.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['destination_ids', 'is_stale', 'computed_at'],
+        )
+        for user_id in user_ids:
+            self.memory.discard(user_id)
+        return lists
+
+    def invalidate(self, user_id):
+        """Mark a user's list stale after their interactions or preferences changed"""
+        self.memory.discard(user_id)
+        UserRecommendation.objects.filter(user_id=user_id, is_stale=False).update(is_stale=True)
+
+
+recommender = Recommender()
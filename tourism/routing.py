@@ -0,0 +1,146 @@
+"""
+Read-replica routing.
+
+Catalogue views opt in to reading from the aliases in
+``settings.READ_REPLICAS``: class-based views set ``use_read_replica``
+and function views are wrapped in ``read_replica``. Everything else,
+including every write, uses the primary (``default``).
+
+``ReplicaRoutingMiddleware`` records the decision for the current request
+in a context variable that ``ReadReplicaRouter`` consults. When a POST (or
+other unsafe request) writes to the primary, the response sets a
+short-lived cookie that keeps that client's catalogue reads on the primary
+for ``READ_REPLICA_STICKY_SECONDS``, so users see their own reviews,
+wishlist changes and trips straight away despite replication lag.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+STICKY_COOKIE = 'db_primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_routing = ContextVar('tourism_db_routing', default=None)
+
+
+class RequestRouting:
+    """Routing state of one request, shared by the threads serving it"""
+
+    def __init__(self):
+        self.replica = None
+        self.wrote = False
+
+
+def read_replica(view):
+    """Mark a function view as a catalogue read that replicas may serve"""
+    view.use_read_replica = True
+    return view
+
+
+def uses_read_replica(view_func):
+    view_class = getattr(view_func, 'view_class', None)
+    return bool(getattr(view_func, 'use_read_replica', False)
+                or getattr(view_class, 'use_read_replica', False))
+
+
+def _sticky(request):
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+@contextmanager
+def primary_reads():
+    """Read from the primary inside the block, whatever the request"""
+    token = _routing.set(None)
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if routing is None or routing.replica is None:
+            return DEFAULT_DB_ALIAS
+        # A lagging replica would serve cache entries already invalidated
+        if model._meta.app_label == 'django_cache':
+            return DEFAULT_DB_ALIAS
+        # Reads inside a transaction must see its uncommitted writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        return db not in settings.READ_REPLICAS
+
+
+class ReplicaRoutingMiddleware:
+    """Route safe requests to opted-in views to a random read replica"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Spare async requests a thread hop for the sync hook
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _routing.set(RequestRouting())
+        try:
+            return self.finish(request, self.get_response(request))
+        finally:
+            _routing.reset(token)
+
+    async def __acall__(self, request):
+        token = _routing.set(RequestRouting())
+        try:
+            return self.finish(request, await self.get_response(request))
+        finally:
+            _routing.reset(token)
+
+    def route(self, request, view_func):
+        routing = _routing.get()
+        if (routing is not None and settings.READ_REPLICAS
+                and request.method in SAFE_METHODS
+                and uses_read_replica(view_func) and not _sticky(request)):
+            routing.replica = random.choice(settings.READ_REPLICAS)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.route(request, view_func)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        self.route(request, view_func)
+
+    def finish(self, request, response):
+        routing = _routing.get()
+        # Cache fills made while serving GETs (weather, places) don't pin
+        if routing.wrote and settings.READ_REPLICAS and request.method not in SAFE_METHODS:
+            seconds = settings.READ_REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                STICKY_COOKIE, f'{time.time() + seconds:.0f}',
+                max_age=seconds, httponly=True, samesite='Lax',
+            )
+        return response
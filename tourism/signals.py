@@ -0,0 +1,105 @@
+"""
+Signal handlers keeping in-process catalogue structures, stored
+recommendations, trending counters, cached wishlists and profile counters
+in sync.
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import UserProfile
+
+from .catalogue import REVIEW_STAT_FIELDS, catalogue
+from .models import Category, Destination, Review, State, Trip, TripDestination, Wishlist
+from .recommendations import recommender
+from .trending import trending
+from .wishlist import wishlist_changed
+
+TRENDING_EVENTS = {Review: 'review', TripDestination: 'trip'}
+# UserProfile counter of each model counted per user
+PROFILE_COUNTERS = {Review: 'review_count', Trip: 'trip_count'}
+
+
+def destinations_changed():
+    """Refresh derived data after a bulk ``update()`` that sent no signals"""
+    catalogue.invalidate()
+
+
+def trip_stops_added(trip, stops):
+    """Refresh derived data after stops were bulk-created without signals"""
+    recommender.invalidate(trip.user_id)
+    for stop in stops:
+        if stop.destination_id is not None:
+            trending.record(stop.destination_id, TRENDING_EVENTS[TripDestination])
+
+
+@receiver(post_save, sender=Destination)
+@receiver(post_delete, sender=Destination)
+def invalidate_destination(sender, instance, update_fields=None, **kwargs):
+    if update_fields and update_fields <= REVIEW_STAT_FIELDS:
+        catalogue.review_stats_changed()
+    else:
+        catalogue.invalidate()
+
+
+@receiver(post_save, sender=State)
+@receiver(post_delete, sender=State)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalogue(sender, **kwargs):
+    """State and category edits can touch any destination"""
+    catalogue.invalidate()
+
+
+@receiver(m2m_changed, sender=Destination.categories.through)
+def invalidate_destination_categories(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        catalogue.invalidate()
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_save, sender=UserProfile)
+def invalidate_user_recommendations(sender, instance, **kwargs):
+    recommender.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=TripDestination)
+@receiver(post_delete, sender=TripDestination)
+def invalidate_trip_recommendations(sender, instance, **kwargs):
+    if TripDestination.trip.is_cached(instance):
+        user_id = instance.trip.user_id
+    else:
+        user_id = Trip.objects.filter(pk=instance.trip_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        recommender.invalidate(user_id)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_save, sender=TripDestination)
+def count_trending_engagement(sender, instance, created, **kwargs):
+    if created and instance.destination_id is not None:
+        trending.record(instance.destination_id, TRENDING_EVENTS[sender])
+
+
+@receiver(post_save, sender=Wishlist)
+@receiver(post_delete, sender=Wishlist)
+def invalidate_wishlist(sender, instance, created=False, **kwargs):
+    if created:
+        wishlist_changed(instance.user_id, added=[instance.destination_id])
+    elif kwargs['signal'] is post_delete:
+        wishlist_changed(instance.user_id, removed=1)
+    else:
+        wishlist_changed(instance.user_id)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_save, sender=Trip)
+def count_created_activity(sender, instance, created, **kwargs):
+    if created:
+        UserProfile.adjust_counters(instance.user_id, **{PROFILE_COUNTERS[sender]: 1})
+
+
+@receiver(post_delete, sender=Review)
+@receiver(post_delete, sender=Trip)
+def count_deleted_activity(sender, instance, **kwargs):
+    UserProfile.adjust_counters(instance.user_id, **{PROFILE_COUNTERS[sender]: -1})
@@ -0,0 +1,53 @@
+"""
+Job tasks run by the ``worker`` command (see ``tourism.jobs``).
+
+Each task is given a chunk of object IDs plus the job's params and returns
+how many of those objects it failed on.
+"""
+import requests
+from django.core.files.base import ContentFile
+
+from .jobs import task
+from .models import Destination
+from .signals import destinations_changed
+
+SAMPLE_IMAGES = {
+    'cultural': 'https://images.unsplash.com/photo-1564507592333-c60657eea523?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',
+    'historical': 'https://images.unsplash.com/photo-1587474260584-136574528ed5?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',
+    'religious': 'https://images.unsplash.com/photo-1609920658906-8223bd289001?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',
+    'adventure': 'https://images.unsplash.com/photo-1551524164-6cf777e44b37?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',
+    'wildlife': 'https://images.unsplash.com/photo-1549366021-9f761d040a94?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',
+    'beach': 'https://images.unsplash.com/photo-1559827260-dc66d52bef19?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',
+    'mountain': 'https://images.unsplash.com/photo-1464822759844-d150baec4494?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',
+    'eco': 'https://images.unsplash.com/photo-1441974231531-c6227db76b6e?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',
+}
+
+
+@task('set_featured')
+def set_featured(destination_ids, featured):
+    """Mark destinations as featured or not"""
+    Destination.objects.filter(pk__in=destination_ids).update(featured=featured)
+    destinations_changed()
+
+
+# Each destination is a download, so keep chunks short for steady progress
+@task('add_sample_images', chunk_size=10)
+def add_sample_images(destination_ids):
+    """Download a sample image for destinations that don't have one"""
+    failed = 0
+    destinations = Destination.objects.filter(pk__in=destination_ids, main_image='').prefetch_related('categories')
+    for destination in destinations:
+        first_category = next(iter(destination.categories.all()), None)
+        category_name = first_category.name if first_category else 'cultural'
+        image_url = SAMPLE_IMAGES.get(category_name, SAMPLE_IMAGES['cultural'])
+        try:
+            response = requests.get(image_url, timeout=30)
+            response.raise_for_status()
+            destination.main_image.save(
+                f"{destination.slug}_main.jpg",
+                ContentFile(response.content),
+                save=True
+            )
+        except Exception:
+            failed += 1
+    return failed
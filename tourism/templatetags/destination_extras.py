@@ -2,6 +2,8 @@ from django import template
 from django.templatetags.static import static
 import hashlib
 
+from tourism.user_state import user_state
+
 register = template.Library()
 
 # Beautiful gradient colors for different destination categories
@@ -135,11 +137,14 @@ def destination_gallery_images(destination, count=3):
     return gallery
 
 
-@register.inclusion_tag('tourism/includes/destination_card.html')
-def destination_card(destination, show_description=True, card_class=""):
+@register.inclusion_tag('tourism/includes/destination_card.html', takes_context=True)
+def destination_card(context, destination, show_description=True, card_class=""):
     """Render a beautiful destination card"""
+    request = context.get('request')
     return {
         'destination': destination,
         'show_description': show_description,
         'card_class': card_class,
+        'user': context.get('user'),
+        'in_wishlist': request is not None and user_state(request).in_wishlist(destination.id),
     }
\ No newline at end of file
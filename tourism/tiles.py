@@ -0,0 +1,226 @@
+"""
+Mapbox Vector Tiles (MVT 2.1) for the destinations map layer.
+
+Tiles are built from the map cluster index, so low zooms carry a bounded
+number of cluster points per tile and deep zooms carry the individual
+destinations with their rating and categories as attributes. Encoded
+tiles are cached on disk under ``TILE_CACHE_DIR`` as ``z/x/y-<fingerprint>``,
+where the fingerprint hashes the data of the points on that tile (see
+``ClusterIndex.tile_fingerprint``). Moving, adding, removing or editing a
+destination only changes the fingerprints of the tiles it lies on, one
+per zoom, so only those are rebuilt. A worker still on an older snapshot
+writes under the old fingerprint, which current workers never read.
+``build_destination_tiles`` removes tiles whose fingerprint is no longer
+current; requests never delete anything.
+
+The protobuf encoding is written out by hand: a points-only layer needs a
+small subset of the format and this avoids a binary dependency.
+"""
+import os
+import shutil
+import struct
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+from .clustering import map_clusters, project
+from .filters import DestinationFilter
+
+LAYER_NAME = 'destinations'
+EXTENT = 4096
+MAX_TILE_ZOOM = 22
+
+# Protobuf wire types
+VARINT, LENGTH_DELIMITED, FIXED64 = 0, 2, 1
+
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+
+def _bytes_field(field, payload):
+    return _key(field, LENGTH_DELIMITED) + _varint(len(payload)) + payload
+
+
+def _varint_field(field, value):
+    return _key(field, VARINT) + _varint(value)
+
+
+def _packed_field(field, values):
+    return _bytes_field(field, b''.join(_varint(value) for value in values))
+
+
+def _encode_value(value):
+    """Encode a ``Tile.Value`` message"""
+    if isinstance(value, bool):
+        return _varint_field(7, int(value))
+    if isinstance(value, int) and value >= 0:
+        return _varint_field(5, value)
+    if isinstance(value, int):
+        return _key(6, VARINT) + _varint(_zigzag(value))
+    if isinstance(value, float):
+        return _key(3, FIXED64) + struct.pack('<d', value)
+    return _bytes_field(1, str(value).encode())
+
+
+def encode_layer(name, features, extent=EXTENT):
+    """
+    Encode a point layer; ``features`` are ``(id, x, y, properties)`` with
+    ``x``/``y`` in tile coordinates (0..extent).
+    """
+    keys, values = {}, {}
+    encoded_features = []
+    for feature_id, x, y, properties in features:
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault((type(value), value), len(values)))
+        # MoveTo with one point, relative to the origin
+        geometry = [(1 & 0x7) | (1 << 3), _zigzag(x), _zigzag(y)]
+        body = b''
+        if feature_id is not None:
+            body += _varint_field(1, feature_id)
+        body += _packed_field(2, tags) + _varint_field(3, 1) + _packed_field(4, geometry)
+        encoded_features.append(_bytes_field(2, body))
+
+    layer = _varint_field(15, 2) + _bytes_field(1, name.encode())
+    layer += b''.join(encoded_features)
+    layer += b''.join(_bytes_field(3, key.encode()) for key in keys)
+    layer += b''.join(_bytes_field(4, _encode_value(value)) for _, value in values)
+    layer += _varint_field(5, extent)
+    return _bytes_field(3, layer)
+
+
+def _tile_properties(properties):
+    """Flatten feature properties to MVT-compatible scalar attributes"""
+    if properties.get('cluster'):
+        return {'cluster': True, 'point_count': properties['point_count'],
+                'expansion_zoom': properties['expansion_zoom']}
+    categories = properties.get('categories') or []
+    return {
+        'name': properties['name'],
+        'slug': properties['slug'],
+        'city': properties['city'],
+        'state': properties['state'],
+        'average_rating': properties['average_rating'],
+        'featured': properties['featured'],
+        'category': categories[0] if categories else None,
+        'categories': ','.join(categories),
+    }
+
+
+def build_tile(clusters, zoom, x, y):
+    """Encode the destinations tile ``zoom``/``x``/``y`` from ``clusters``"""
+    scale = 1 << zoom
+    features = []
+    for feature in clusters.tile_features(zoom, x, y):
+        lng, lat = feature['geometry']['coordinates']
+        px, py = project(lng, lat)
+        tile_x = int(round((px * scale - x) * EXTENT))
+        tile_y = int(round((py * scale - y) * EXTENT))
+        feature_id = feature['id'] if isinstance(feature['id'], int) else None
+        features.append((feature_id, tile_x, tile_y, _tile_properties(feature['properties'])))
+    if not features:
+        return b''
+    return encode_layer(LAYER_NAME, features)
+
+
+def tile_for_point(zoom, lng, lat):
+    px, py = project(lng, lat)
+    scale = 1 << zoom
+    return min(int(px * scale), scale - 1), min(int(py * scale), scale - 1)
+
+
+class TileCache:
+    """On-disk cache of encoded tiles laid out as ``z/x/y-<fingerprint>.pbf``"""
+
+    @property
+    def root(self):
+        return Path(getattr(settings, 'TILE_CACHE_DIR', settings.BASE_DIR / 'tile_cache')) / LAYER_NAME
+
+    def clusters(self):
+        """The cluster index tiles are currently built from"""
+        return map_clusters.get(DestinationFilter())
+
+    def path(self, zoom, x, y, fingerprint):
+        return self.root / str(zoom) / str(x) / f'{y}-{fingerprint}.pbf'
+
+    def get(self, zoom, x, y, clusters=None):
+        """Return the tile bytes, building and storing them on a miss"""
+        clusters = clusters or self.clusters()
+        path = self.path(zoom, x, y, clusters.tile_fingerprint(zoom, x, y))
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:
+            pass
+
+        data = build_tile(clusters, zoom, x, y)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write then rename so readers never see a partial tile
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            # Pruned mid-write, or the disk is unwritable; serve uncached
+            pass
+        return data
+
+    def prune(self, clusters=None):
+        """Remove tiles whose points changed since they were built; returns how many"""
+        clusters = clusters or self.clusters()
+        if not self.root.exists():
+            return 0
+        removed = 0
+        for directory in self.root.iterdir():
+            if not directory.name.isdigit():
+                # Left over from an older cache layout
+                shutil.rmtree(directory, ignore_errors=True)
+                continue
+            zoom = int(directory.name)
+            for path in directory.glob('*/*.pbf'):
+                y, _, fingerprint = path.stem.partition('-')
+                if fingerprint != clusters.tile_fingerprint(zoom, int(path.parent.name), int(y)):
+                    path.unlink(missing_ok=True)
+                    removed += 1
+        return removed
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def prebuild(self, max_zoom=8):
+        """Build every non-empty tile up to ``max_zoom``; returns the tile count"""
+        clusters = self.clusters()
+        built = 0
+        for zoom in range(min(max_zoom, MAX_TILE_ZOOM) + 1):
+            tiles = {
+                tile_for_point(zoom, point['longitude'], point['latitude'])
+                for point in clusters.points
+            }
+            for x, y in tiles:
+                self.get(zoom, x, y, clusters)
+                built += 1
+        return built
+
+
+tile_cache = TileCache()
@@ -0,0 +1,165 @@
+"""
+Trending destinations from time-decayed engagement counters.
+
+Views, wishlist adds, reviews and trip additions are weighted and summed
+per destination into fixed time buckets (``TrendingCounter``). Requests
+only add to an in-process buffer; a ``tourism.flusher`` daemon thread
+writes it out with one batched upsert every ``TRENDING_FLUSH_INTERVAL``
+seconds (sooner at ``TRENDING_FLUSH_SIZE`` pending counters), on its own
+connection, so a page view is never a database write of its own and
+counts never join a request's transaction.
+
+A destination's trending score is the sum of its buckets, each halved
+every ``TRENDING_HALF_LIFE`` seconds of age. Scores are re-read at most
+every ``TRENDING_REFRESH_INTERVAL`` seconds per process and turned into a
+listing order over the catalogue snapshot.
+"""
+import atexit
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .flusher import BufferedFlusher
+from .models import TrendingCounter
+
+logger = logging.getLogger(__name__)
+
+TRENDING_SORT = 'trending'
+
+EVENT_WEIGHTS = {
+    'view': 1.0,
+    'trip': 3.0,
+    'review': 4.0,
+    'wishlist': 5.0,
+}
+
+
+def bucket_start(moment=None):
+    """Start of the bucket containing ``moment`` (default now)"""
+    size = settings.TRENDING_BUCKET_SECONDS
+    seconds = (moment or timezone.now()).timestamp()
+    return datetime.fromtimestamp(seconds - seconds % size, tz=dt_timezone.utc)
+
+
+def decayed_scores(rows, now=None):
+    """``{destination_id: score}`` from ``(destination_id, bucket, score)`` rows"""
+    now = now or timezone.now()
+    half_life = settings.TRENDING_HALF_LIFE
+    scores = defaultdict(float)
+    for destination_id, bucket, score in rows:
+        age = max((now - bucket).total_seconds(), 0)
+        scores[destination_id] += score * 0.5 ** (age / half_life)
+    return dict(scores)
+
+
+class TrendingCounters(BufferedFlusher):
+    """Process-wide event buffer and trending ranking"""
+    thread_name = 'trending-flush'
+    interval_setting = 'TRENDING_FLUSH_INTERVAL'
+
+    def __init__(self):
+        super().__init__()
+        self._pending = defaultdict(float)
+        self._last_prune = 0.0
+        self._scores = None
+        self._scores_at = 0.0
+        self._order = None
+
+    def record(self, destination_id, event):
+        """Count one ``event`` (a key of ``EVENT_WEIGHTS``) for a destination"""
+        key = (destination_id, bucket_start())
+        with self._lock:
+            self._pending[key] += EVENT_WEIGHTS[event]
+            full = len(self._pending) >= settings.TRENDING_FLUSH_SIZE
+        if full:
+            self._wake.set()
+        self._ensure_thread()
+
+    def drain(self):
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(float)
+        return pending
+
+    def write(self, pending):
+        """Add the buffered counts to the stored buckets; returns the rows written"""
+        try:
+            self._upsert(pending)
+        except Exception:
+            # Put the counts back rather than lose them; the next flush retries
+            logger.exception('Could not flush %d trending counters', len(pending))
+            with self._lock:
+                for key, score in pending.items():
+                    self._pending[key] += score
+            return 0
+        self._prune()
+        return len(pending)
+
+    def _upsert(self, pending):
+        table = connection.ops.quote_name(TrendingCounter._meta.db_table)
+        adapt = connection.ops.adapt_datetimefield_value
+        rows = list(pending.items())
+        with transaction.atomic(), connection.cursor() as cursor:
+            for start in range(0, len(rows), 500):
+                batch = rows[start:start + 500]
+                params = []
+                for (destination_id, bucket), score in batch:
+                    params.extend((destination_id, adapt(bucket), score))
+                cursor.execute(
+                    f'INSERT INTO {table} (destination_id, bucket, score) '
+                    f'VALUES {", ".join(["(%s, %s, %s)"] * len(batch))} '
+                    f'ON CONFLICT (destination_id, bucket) '
+                    f'DO UPDATE SET score = {table}.score + excluded.score',
+                    params,
+                )
+
+    def _prune(self):
+        """Drop buckets too old to matter, at most hourly"""
+        if time.monotonic() - self._last_prune < 3600:
+            return
+        self._last_prune = time.monotonic()
+        cutoff = timezone.now() - timedelta(seconds=settings.TRENDING_WINDOW)
+        TrendingCounter.objects.filter(bucket__lt=cutoff).delete()
+
+    def scores(self):
+        """Decayed score per destination with any engagement in the window"""
+        if self._scores is None or time.monotonic() - self._scores_at >= settings.TRENDING_REFRESH_INTERVAL:
+            now = timezone.now()
+            rows = TrendingCounter.objects.filter(
+                bucket__gte=now - timedelta(seconds=settings.TRENDING_WINDOW)
+            ).values_list('destination_id', 'bucket', 'score')
+            self._scores = decayed_scores(rows, now)
+            self._scores_at = time.monotonic()
+        return self._scores
+
+    def order(self, catalogue_snapshot):
+        """
+        Ranks of ``catalogue_snapshot.destinations`` by trending score, ties
+        and destinations without engagement in default listing order
+        """
+        scores = self.scores()
+        cached = self._order
+        if cached is not None and cached[0] is catalogue_snapshot and cached[1] is scores:
+            return cached[2]
+        order = tuple(record.rank for record in sorted(
+            catalogue_snapshot.destinations, key=lambda record: (-scores.get(record.id, 0.0), record.rank)
+        ))
+        self._order = (catalogue_snapshot, scores, order)
+        return order
+
+    def top(self, catalogue_snapshot, limit):
+        """The ``limit`` most trending records with any recent engagement"""
+        scores = self.scores()
+        records = catalogue_snapshot.destinations
+        return [
+            records[rank] for rank in self.order(catalogue_snapshot)[:limit]
+            if scores.get(records[rank].id, 0.0) > 0
+        ]
+
+
+trending = TrendingCounters()
+atexit.register(trending.flush)
@@ -8,16 +8,43 @@ from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
 from django.db import transaction
+from django.db.models import Count, F, Max, Value
+from django.db.models.functions import Greatest
 from django.core.paginator import Paginator
 import json
-import requests
 from decimal import Decimal
 from datetime import datetime, timedelta
 
-from .models import Trip, TripDestination, Destination, PlaceWeatherCache
+from .models import Trip, TripDestination, Destination, PlaceWeatherCache, Wishlist
 from .forms import TripForm
+from .conditional import conditional_json, memoize_on_request
+from . import places, weather
+from .outbound import ASYNC_HTTP_ERRORS, RateLimitExceeded
+from .signals import trip_stops_added
 from django.conf import settings
 
+# Most stops accepted by one bulk add
+BULK_ADD_LIMIT = 100
+
+
+def serialize_trip_destinations(trip_destinations):
+    """Trip stops as the dicts used by the trip planner's JavaScript"""
+    return [
+        {
+            'id': td.id,
+            'name': td.get_name(),
+            'address': td.get_address(),
+            'latitude': float(td.latitude),
+            'longitude': float(td.longitude),
+            'order': td.order,
+            'is_visited': td.is_visited,
+            'place_id': td.place_id,
+            'planned_date': td.planned_date.isoformat() if td.planned_date else None,
+            'notes': td.notes,
+        }
+        for td in trip_destinations
+    ]
+
 
 class TripListView(LoginRequiredMixin, ListView):
     """List user's trips"""
@@ -76,25 +103,8 @@ class TripPlannerView(LoginRequiredMixin, DetailView):
             'destination__state'
         ).order_by('order')
         
-        # Convert to JSON for JavaScript
-        destinations_data = []
-        for td in trip_destinations:
-            destinations_data.append({
-                'id': td.id,
-                'name': td.get_name(),
-                'address': td.get_address(),
-                'latitude': float(td.latitude),
-                'longitude': float(td.longitude),
-                'order': td.order,
-                'is_visited': td.is_visited,
-                'place_id': td.place_id,
-                'planned_date': td.planned_date.isoformat() if td.planned_date else None,
-                'notes': td.notes,
-            })
-        
         context.update({
             'trip_destinations': trip_destinations,
-            'destinations_json': json.dumps(destinations_data),
             'weather_api_key': settings.OPENWEATHER_API_KEY,
         })
         return context
@@ -135,21 +145,18 @@ def add_destination_to_trip(request):
         
         trip = get_object_or_404(Trip, id=trip_id, user=request.user)
         
-        # Get the next order number
-        last_destination = trip.tripdestination_set.order_by('-order').first()
-        next_order = (last_destination.order + 1) if last_destination else 1
-        
-        # Create trip destination
-        trip_destination = TripDestination.objects.create(
-            trip=trip,
-            destination_id=destination_id if destination_id else None,
-            custom_name=custom_name,
-            custom_address=custom_address,
-            latitude=Decimal(str(latitude)),
-            longitude=Decimal(str(longitude)),
-            place_id=place_id,
-            order=next_order
-        )
+        with transaction.atomic():
+            [order] = Trip.allocate_stop_orders(trip.pk)
+            trip_destination = TripDestination.objects.create(
+                trip=trip,
+                destination_id=destination_id if destination_id else None,
+                custom_name=custom_name,
+                custom_address=custom_address,
+                latitude=Decimal(str(latitude)),
+                longitude=Decimal(str(longitude)),
+                place_id=place_id,
+                order=order
+            )
         
         return JsonResponse({
             'success': True,
@@ -165,6 +172,69 @@ def add_destination_to_trip(request):
         }, status=400)
 
 
+@require_POST
+@login_required
+def add_destinations_to_trip(request):
+    """Add several destinations, or the whole wishlist, to a trip via AJAX"""
+    try:
+        data = json.loads(request.body)
+        trip = get_object_or_404(Trip, id=data.get('trip_id'), user=request.user)
+        
+        if data.get('wishlist'):
+            requested = list(Wishlist.objects.filter(user=request.user).order_by('created_at').values_list(
+                'destination_id', flat=True
+            ))
+        else:
+            requested = [int(destination_id) for destination_id in data.get('destination_ids', [])]
+        requested = list(dict.fromkeys(requested))
+        if len(requested) > BULK_ADD_LIMIT:
+            return JsonResponse({
+                'success': False,
+                'message': f'Add at most {BULK_ADD_LIMIT} destinations at a time'
+            }, status=400)
+        
+        with transaction.atomic():
+            # Check the trip's stops under its lock, so a concurrent add of
+            # the same destinations waits and then skips them
+            Trip.lock(trip.pk)
+            on_trip = set(trip.tripdestination_set.filter(
+                destination_id__in=requested
+            ).values_list('destination_id', flat=True))
+            found = Destination.objects.select_related('state').filter(
+                is_active=True, latitude__isnull=False, longitude__isnull=False
+            ).in_bulk([destination_id for destination_id in requested if destination_id not in on_trip])
+            destinations = [found[destination_id] for destination_id in requested if destination_id in found]
+            
+            stops = []
+            if destinations:
+                orders = Trip.allocate_stop_orders(trip.pk, len(destinations))
+                stops = TripDestination.objects.bulk_create([
+                    TripDestination(
+                        trip=trip,
+                        destination=destination,
+                        latitude=destination.latitude,
+                        longitude=destination.longitude,
+                        order=order
+                    )
+                    for destination, order in zip(destinations, orders)
+                ])
+        if stops:
+            trip_stops_added(trip, stops)
+        
+        return JsonResponse({
+            'success': True,
+            'message': f'Added {len(stops)} destinations to your trip!',
+            'added': serialize_trip_destinations(stops),
+            'skipped': len(requested) - len(stops),
+        })
+    
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Error adding destinations: {str(e)}'
+        }, status=400)
+
+
 @require_POST
 @login_required
 def mark_destination_visited(request):
@@ -246,7 +316,10 @@ def reorder_destinations(request):
                 TripDestination.objects.filter(
                     id=dest_data['id'],
                     trip=trip
-                ).update(order=dest_data['order'])
+                ).update(order=dest_data['order'], updated_at=timezone.now())
+            # Keep new stops after every order the client chose
+            highest = max((dest_data['order'] for dest_data in destination_orders), default=0)
+            Trip.objects.filter(pk=trip.pk).update(stop_sequence=Greatest(F('stop_sequence'), Value(highest)))
         
         return JsonResponse({
             'success': True,
@@ -295,66 +368,174 @@ def clear_all_trips(request):
         return redirect('tourism:trip_list')
 
 
-def get_weather_for_location(request):
+@memoize_on_request
+def _trip_stops_state(request, pk):
+    """Trip timestamp plus stop count/latest change, or None if not the user's trip"""
+    return Trip.objects.filter(pk=pk, user=request.user).annotate(
+        stop_count=Count('tripdestination'),
+        stops_updated=Max('tripdestination__updated_at'),
+    ).values_list('updated_at', 'stop_count', 'stops_updated').first()
+
+
+def _trip_stops_version(request, pk):
+    state = _trip_stops_state(request, pk)
+    return None if state is None else '|'.join(str(value) for value in state)
+
+
+def _trip_stops_last_modified(request, pk):
+    state = _trip_stops_state(request, pk)
+    if state is None:
+        return None
+    updated_at, _, stops_updated = state
+    return max(updated_at, stops_updated) if stops_updated else updated_at
+
+
+@login_required
+@conditional_json(_trip_stops_version, _trip_stops_last_modified, private=True, no_cache=True)
+def trip_destinations_json(request, pk):
+    """Stops of a trip in planner order as JSON"""
+    trip = get_object_or_404(Trip, pk=pk, user=request.user)
+    trip_destinations = trip.tripdestination_set.select_related(
+        'destination__state'
+    ).order_by('order')
+    
+    return JsonResponse({
+        'success': True,
+        'destinations': serialize_trip_destinations(trip_destinations),
+    })
+
+
+def _busy_response(message):
+    """503 telling the client to retry once the upstream budget refills"""
+    response = JsonResponse({
+        'success': False,
+        'message': message
+    }, status=503)
+    response['Retry-After'] = '5'
+    return response
+
+
+@memoize_on_request
+async def _weather_cache_entry(request):
+    """Cached weather row for the requested coordinates, if any"""
+    latitude = float(request.GET.get('lat'))
+    longitude = float(request.GET.get('lng'))
+    return await PlaceWeatherCache.objects.filter(
+        latitude=Decimal(str(latitude)),
+        longitude=Decimal(str(longitude))
+    ).afirst()
+
+
+async def _fresh_weather_cached_at(request):
+    try:
+        cache_obj = await _weather_cache_entry(request)
+    except (TypeError, ValueError):
+        return None
+    return cache_obj.cached_at if cache_obj and cache_obj.is_fresh() else None
+
+
+async def _weather_version(request):
+    cached_at = await _fresh_weather_cached_at(request)
+    return cached_at and cached_at.isoformat()
+
+
+@conditional_json(_weather_version, _fresh_weather_cached_at, public=True, max_age=600)
+async def get_weather_for_location(request):
     """Get weather information for a location"""
     try:
         latitude = float(request.GET.get('lat'))
         longitude = float(request.GET.get('lng'))
         
         # Check if we have cached weather data
-        cache_obj = PlaceWeatherCache.objects.filter(
-            latitude=Decimal(str(latitude)),
-            longitude=Decimal(str(longitude))
-        ).first()
+        cache_obj = await _weather_cache_entry(request)
         
         if cache_obj and cache_obj.is_fresh():
             return JsonResponse({
                 'success': True,
-                'temperature': cache_obj.temperature,
-                'description': cache_obj.description,
-                'humidity': cache_obj.humidity,
-                'wind_speed': cache_obj.wind_speed,
-                'icon': cache_obj.icon,
+                **weather.weather_payload(cache_obj)
             })
         
-        # Fetch from OpenWeather API
-        api_key = settings.OPENWEATHER_API_KEY
-        url = f"http://api.openweathermap.org/data/2.5/weather?lat={latitude}&lon={longitude}&appid={api_key}&units=metric"
-        
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            
-            weather_data = {
-                'temperature': data['main']['temp'],
-                'description': data['weather'][0]['description'].title(),
-                'humidity': data['main']['humidity'],
-                'wind_speed': data['wind']['speed'],
-                'icon': data['weather'][0]['icon'],
-            }
-            
-            # Cache the weather data
-            if cache_obj:
-                for key, value in weather_data.items():
-                    setattr(cache_obj, key, value)
-                cache_obj.cached_at = timezone.now()
-                cache_obj.save()
-            else:
-                PlaceWeatherCache.objects.create(
-                    latitude=Decimal(str(latitude)),
-                    longitude=Decimal(str(longitude)),
-                    **weather_data
-                )
-            
+        # Fetch from OpenWeather API; serve stale data if that fails
+        try:
+            weather_data = await weather.arefresh_weather(latitude, longitude)
+        except (weather.WeatherAPIError, RateLimitExceeded, *ASYNC_HTTP_ERRORS):
+            if not cache_obj:
+                raise
             return JsonResponse({
                 'success': True,
-                **weather_data
+                'stale': True,
+                **weather.weather_payload(cache_obj)
             })
+        
+        return JsonResponse({
+            'success': True,
+            **weather_data
+        })
+    
+    except RateLimitExceeded:
+        return _busy_response('Weather service is busy, please try again shortly')
+    except weather.WeatherAPIError as e:
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        }, status=400)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Error fetching weather: {str(e)}'
+        }, status=400)
+
+
+# Most locations one batch weather request may ask for
+MAX_WEATHER_BATCH = 50
+
+
+async def get_weather_batch(request):
+    """Weather for every stop of a trip (?trip=<id>) or for ?points=lat,lng;lat,lng"""
+    try:
+        trip_id = request.GET.get('trip')
+        if trip_id:
+            user = await request.auser()
+            if not user.is_authenticated:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Login required'
+                }, status=401)
+            if not await Trip.objects.filter(pk=trip_id, user=user).aexists():
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Trip not found'
+                }, status=404)
+            stops = [
+                (stop_id, float(latitude), float(longitude))
+                async for stop_id, latitude, longitude in TripDestination.objects.filter(
+                    trip_id=trip_id
+                ).order_by('order').values_list('id', 'latitude', 'longitude')
+            ]
         else:
+            stops = []
+            for point in request.GET.get('points', '').split(';'):
+                if point:
+                    latitude, longitude = (float(value) for value in point.split(','))
+                    stops.append((None, latitude, longitude))
+        
+        if not stops or len(stops) > MAX_WEATHER_BATCH:
             return JsonResponse({
                 'success': False,
-                'message': 'Weather data unavailable'
+                'message': f'Give a trip or between 1 and {MAX_WEATHER_BATCH} points'
             }, status=400)
+        
+        results = await weather.aweather_for_points(
+            [(latitude, longitude) for _, latitude, longitude in stops],
+            max_wait=settings.WEATHER_BATCH_MAX_WAIT,
+        )
+        return JsonResponse({
+            'success': True,
+            'results': [
+                {'id': stop_id, 'latitude': latitude, 'longitude': longitude, **result}
+                for (stop_id, latitude, longitude), result in zip(stops, results)
+            ]
+        })
     
     except Exception as e:
         return JsonResponse({
@@ -363,51 +544,29 @@ def get_weather_for_location(request):
         }, status=400)
 
 
-def get_nearby_places(request):
+async def get_nearby_places(request):
     """Get nearby places using Google Places API"""
     try:
-        latitude = request.GET.get('lat')
-        longitude = request.GET.get('lng')
+        latitude = float(request.GET.get('lat'))
+        longitude = float(request.GET.get('lng'))
         place_type = request.GET.get('type', 'tourist_attraction')
-        radius = request.GET.get('radius', '5000')  # 5km default
-        
-        # Google Places API implementation
-        api_key = settings.GOOGLE_MAPS_API_KEY
-        
-        if api_key and api_key != 'YOUR_GOOGLE_MAPS_API_KEY':
-            url = 'https://maps.googleapis.com/maps/api/place/nearbysearch/json'
-            params = {
-                'location': f'{latitude},{longitude}',
-                'radius': radius,
-                'type': place_type,
-                'key': api_key
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                
-                nearby_places = []
-                for place in data.get('results', [])[:10]:  # Limit to 10 results
-                    nearby_places.append({
-                        'name': place.get('name', 'Unknown'),
-                        'type': place.get('types', [''])[0] if place.get('types') else '',
-                        'rating': place.get('rating', 0),
-                        'vicinity': place.get('vicinity', ''),
-                        'place_id': place.get('place_id', ''),
-                        'price_level': place.get('price_level', 0),
-                        'is_open': place.get('opening_hours', {}).get('open_now', None)
-                    })
-                
-                return JsonResponse({
-                    'success': True,
-                    'places': nearby_places
-                })
-            else:
+        radius = int(request.GET.get('radius', '5000'))  # 5km default
+        
+        if places.api_key_configured():
+            try:
+                nearby_places = await places.nearby_places.asearch(latitude, longitude, place_type, radius)
+            except places.PlacesAPIError as e:
                 return JsonResponse({
                     'success': False,
-                    'message': 'Google Places API error'
+                    'message': str(e)
                 }, status=400)
+            except RateLimitExceeded:
+                return _busy_response('Places service is busy, please try again shortly')
+            
+            return JsonResponse({
+                'success': True,
+                'places': nearby_places
+            })
         else:
             # Fallback to mock data if no API key
             nearby_places = [
@@ -440,7 +599,8 @@ def get_nearby_places(request):
         }, status=400)
 
 
-def get_place_details(request):
+@conditional_json(public=True, max_age=3600)
+async def get_place_details(request):
     """Get detailed information about a place"""
     try:
         place_id = request.GET.get('place_id')
@@ -451,54 +611,21 @@ def get_place_details(request):
                 'message': 'Place ID is required'
             }, status=400)
         
-        # Google Places Details API implementation
-        api_key = settings.GOOGLE_MAPS_API_KEY
-        
-        if api_key and api_key != 'YOUR_GOOGLE_MAPS_API_KEY':
-            url = 'https://maps.googleapis.com/maps/api/place/details/json'
-            params = {
-                'place_id': place_id,
-                'fields': 'name,formatted_address,formatted_phone_number,website,opening_hours,rating,user_ratings_total,price_level,photos',
-                'key': api_key
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                
-                if data.get('status') == 'OK':
-                    result = data.get('result', {})
-                    
-                    # Format opening hours
-                    opening_hours = []
-                    if 'opening_hours' in result:
-                        opening_hours = result['opening_hours'].get('weekday_text', [])
-                    
-                    place_details = {
-                        'name': result.get('name', 'Unknown Place'),
-                        'address': result.get('formatted_address', 'Address not available'),
-                        'phone': result.get('formatted_phone_number', ''),
-                        'website': result.get('website', ''),
-                        'opening_hours': opening_hours,
-                        'rating': result.get('rating', 0),
-                        'reviews_count': result.get('user_ratings_total', 0),
-                        'price_level': result.get('price_level', 0)
-                    }
-                    
-                    return JsonResponse({
-                        'success': True,
-                        'place': place_details
-                    })
-                else:
-                    return JsonResponse({
-                        'success': False,
-                        'message': f'Places API error: {data.get("status")}'
-                    }, status=400)
-            else:
+        if places.api_key_configured():
+            try:
+                place_details = await places.place_details.aget(place_id)
+            except places.PlacesAPIError as e:
                 return JsonResponse({
                     'success': False,
-                    'message': 'Google Places API request failed'
+                    'message': str(e)
                 }, status=400)
+            except RateLimitExceeded:
+                return _busy_response('Places service is busy, please try again shortly')
+            
+            return JsonResponse({
+                'success': True,
+                'place': place_details
+            })
         else:
             # Fallback to mock data if no API key
             place_details = {
@@ -28,8 +28,13 @@ urlpatterns = [
     
     # AJAX endpoints
     path('api/wishlist/toggle/', views.toggle_wishlist, name='toggle_wishlist'),
+    path('api/wishlist/add/', views.add_to_wishlist, name='add_to_wishlist'),
     path('api/review/add/', views.add_review, name='add_review'),
     path('api/search/suggestions/', views.search_suggestions, name='search_suggestions'),
+    path('api/events/', views.record_event, name='record_event'),
+    path('api/destinations/facets/', views.destination_facets, name='destination_facets'),
+    path('api/destinations/geojson/', views.destinations_geojson, name='destinations_geojson'),
+    path('tiles/destinations/<int:z>/<int:x>/<int:y>.pbf', views.destination_tile, name='destination_tile'),
     
     # Trip Planning
     path('trips/', trip_views.TripListView.as_view(), name='trip_list'),
@@ -40,12 +45,15 @@ urlpatterns = [
     
     # Trip AJAX endpoints
     path('api/trips/add-destination/', trip_views.add_destination_to_trip, name='add_destination_to_trip'),
+    path('api/trips/add-destinations/', trip_views.add_destinations_to_trip, name='add_destinations_to_trip'),
     path('api/trips/mark-visited/', trip_views.mark_destination_visited, name='mark_destination_visited'),
     path('api/trips/remove-destination/', trip_views.remove_destination_from_trip, name='remove_destination_from_trip'),
+    path('api/trips/<int:pk>/destinations/', trip_views.trip_destinations_json, name='trip_destinations_json'),
     path('api/trips/reorder/', trip_views.reorder_destinations, name='reorder_destinations'),
     
     # Map and weather APIs
     path('api/weather/', trip_views.get_weather_for_location, name='get_weather'),
+    path('api/weather/batch/', trip_views.get_weather_batch, name='get_weather_batch'),
     path('api/nearby-places/', trip_views.get_nearby_places, name='get_nearby_places'),
     path('api/place-details/', trip_views.get_place_details, name='get_place_details'),
 ]
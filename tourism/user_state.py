@@ -0,0 +1,103 @@
+"""
+The current user's relationship to the destinations on a page.
+
+``user_state(request)`` returns a resolver shared by everything rendering
+that request. ``annotate()`` takes a page of destinations and attaches
+``in_wishlist`` and ``user_review`` to each. It reads the wishlist from
+the user's cached ID set (see ``tourism.wishlist``) once per request and
+fetches reviews for the whole page at once, so the page costs at most two
+queries however many destinations it shows. Anonymous users cost none.
+
+Catalogue records are shared between requests, so they come back wrapped
+in a ``PersonalDestination`` that carries the flags and reads everything
+else through; model instances get the attributes set directly.
+"""
+from .catalogue import DestinationRecord
+from .conditional import memoize_on_request
+from .models import Review
+from .wishlist import wishlist_ids
+
+
+class PersonalDestination:
+    """A catalogue record plus one user's flags for it"""
+    __slots__ = ('destination', 'in_wishlist', 'user_review')
+
+    def __init__(self, destination, in_wishlist, user_review):
+        self.destination = destination
+        self.in_wishlist = in_wishlist
+        self.user_review = user_review
+
+    def __getattr__(self, name):
+        return getattr(self.destination, name)
+
+    def __str__(self):
+        return str(self.destination)
+
+
+class UserState:
+    """Wishlist and review membership of one user, loaded a page at a time"""
+
+    def __init__(self, user):
+        self.user = user if user.is_authenticated else None
+        self._wishlisted = None
+        self._reviews = {}
+
+    def wishlisted(self):
+        if self.user is None:
+            return frozenset()
+        if self._wishlisted is None:
+            self._wishlisted = wishlist_ids(self.user.pk)
+        return self._wishlisted
+
+    def in_wishlist(self, destination_id):
+        return destination_id in self.wishlisted()
+
+    def review_for(self, destination_id):
+        """The user's review of a destination loaded by ``load``/``annotate``"""
+        return self._reviews.get(destination_id)
+
+    def load(self, destination_ids):
+        """Fetch the user's reviews of any of ``destination_ids`` not loaded yet"""
+        if self.user is None:
+            return
+        missing = [destination_id for destination_id in destination_ids if destination_id not in self._reviews]
+        if not missing:
+            return
+        self._reviews.update(dict.fromkeys(missing))
+        for review in Review.objects.filter(user=self.user, destination_id__in=missing):
+            self._reviews[review.destination_id] = review
+
+    def annotate(self, destinations):
+        """List of ``destinations`` with ``in_wishlist`` and ``user_review`` attached"""
+        destinations = list(destinations)
+        self.load([destination.id for destination in destinations])
+        annotated = []
+        for destination in destinations:
+            in_wishlist = self.in_wishlist(destination.id)
+            user_review = self.review_for(destination.id)
+            if isinstance(destination, DestinationRecord):
+                destination = PersonalDestination(destination, in_wishlist, user_review)
+            else:
+                destination.in_wishlist = in_wishlist
+                destination.user_review = user_review
+            annotated.append(destination)
+        return annotated
+
+
+@memoize_on_request
+def user_state(request):
+    """The ``UserState`` of ``request.user`` for this request"""
+    return UserState(request.user)
+
+
+class UserStateMixin:
+    """ListView mixin annotating the current page with the user's state"""
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        page = user_state(self.request).annotate(context['object_list'])
+        context['object_list'] = page
+        context_object_name = self.get_context_object_name(page)
+        if context_object_name:
+            context[context_object_name] = page
+        return context
@@ -3,102 +3,95 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import ListView, DetailView, TemplateView
-from django.db.models import Q, Count, Avg
-from django.http import JsonResponse
+from django.db.models import Avg
+from django.http import Http404, HttpResponse, JsonResponse
 from django.core.paginator import Paginator
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_POST, etag
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
+import hashlib
 import json
+import math
 
-from .models import Destination, Category, State, Review, Wishlist
+from .models import Destination, Review, Wishlist
 from .forms import ReviewForm
+from .bitmap_index import destination_index
+from .catalogue import SORT_KEYS, RecordList, catalogue
+from .events import CLIENT_EVENTS, events
+from .clustering import map_clusters
+from .conditional import conditional_json, memoize_on_request
+from .facets import compute_facets
+from .filters import DestinationFilter, SITE_SEARCH_FIELDS
+from .pagination import CursorPaginationMixin
+from .recommendations import recommender
+from .routing import read_replica
+from .tiles import MAX_TILE_ZOOM, tile_cache
+from .trending import TRENDING_SORT, trending
+from .user_state import UserStateMixin, user_state
+from . import wishlist
 
 
 class HomeView(TemplateView):
     """Homepage view with featured destinations"""
+    use_read_replica = True
     template_name = 'tourism/home.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        snapshot = catalogue.snapshot()
         context.update({
-            'featured_destinations': Destination.objects.filter(
-                featured=True, is_active=True
-            ).select_related('state').prefetch_related('categories')[:12],
-            'categories': Category.objects.all().annotate(
-                destination_count=Count('destinations')
-            ),
-            'total_destinations': Destination.objects.filter(is_active=True).count(),
-            'total_states': State.objects.annotate(
-                destination_count=Count('destination')
-            ).filter(destination_count__gt=0).count(),
+            'featured_destinations': snapshot.featured[:12],
+            'categories': snapshot.categories,
+            'total_destinations': len(snapshot),
+            'total_states': len(snapshot.by_state),
+            'trending_destinations': trending.top(snapshot, 8),
         })
+        if self.request.user.is_authenticated:
+            context['recommended_destinations'] = recommender.for_user(self.request.user, limit=8)
         return context
 
 
-class DestinationListView(ListView):
+class DestinationListView(UserStateMixin, CursorPaginationMixin, ListView):
     """List all destinations with filtering and pagination"""
+    use_read_replica = True
     model = Destination
     template_name = 'tourism/destinations.html'
     context_object_name = 'destinations'
     paginate_by = 12
     
     def get_queryset(self):
-        queryset = Destination.objects.filter(
-            is_active=True
-        ).select_related('state').prefetch_related('categories')
-        
-        # Search functionality
-        search_query = self.request.GET.get('search')
-        if search_query:
-            queryset = queryset.filter(
-                Q(name__icontains=search_query) |
-                Q(city__icontains=search_query) |
-                Q(state__name__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(short_description__icontains=search_query)
-            )
-        
-        # Category filtering
-        category = self.request.GET.get('category')
-        if category:
-            queryset = queryset.filter(categories__name=category)
-        
-        # State filtering
-        state = self.request.GET.get('state')
-        if state:
-            queryset = queryset.filter(state__name=state)
-        
-        # Rating filtering
-        min_rating = self.request.GET.get('rating')
-        if min_rating:
-            try:
-                min_rating = float(min_rating)
-                queryset = queryset.filter(average_rating__gte=min_rating)
-            except (ValueError, TypeError):
-                pass
+        self.filter = DestinationFilter.from_params(self.request.GET)
+        sort_by = self.request.GET.get('sort', '-featured')
+        if sort_by not in SORT_KEYS and sort_by != TRENDING_SORT:
+            sort_by = None
+        cursor = self.cursor_query_param in self.request.GET
         
-        # Featured filtering
-        featured = self.request.GET.get('featured')
-        if featured == '1' or featured == 'true':
-            queryset = queryset.filter(featured=True)
+        # Without a text search the bitmap index answers the filters and the
+        # page is served from catalogue records; cursor pages seek in SQL.
+        if not self.filter.search and not cursor:
+            return destination_index.resolve(self.filter, sort_by)
         
-        # Sorting
-        sort_by = self.request.GET.get('sort', '-featured')
-        valid_sorts = ['-featured', 'name', '-average_rating', '-total_reviews', '-created_at']
-        if sort_by in valid_sorts:
+        queryset = self.filter.apply(
+            Destination.objects.filter(is_active=True)
+        ).select_related('state').prefetch_related('categories')
+        if sort_by == TRENDING_SORT:
+            if not cursor:
+                # Search matches come from SQL, their order from the counters
+                snapshot = catalogue.snapshot()
+                matches = set(queryset.values_list('id', flat=True))
+                records = snapshot.destinations
+                return [records[rank] for rank in trending.order(snapshot) if records[rank].id in matches]
+            # Trending scores move between pages, so cursors seek in default order
+            sort_by = None
+        if sort_by:
             queryset = queryset.order_by(sort_by, 'name')
         
-        return queryset.distinct()
+        return queryset
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context.update({
-            'categories': Category.objects.all().annotate(
-                destination_count=Count('destinations')
-            ),
-            'states': State.objects.all().annotate(
-                destination_count=Count('destination')
-            ).filter(destination_count__gt=0),
+            'facets': compute_facets(self.filter),
             'search_query': self.request.GET.get('search', ''),
             'selected_category': self.request.GET.get('category', ''),
             'selected_state': self.request.GET.get('state', ''),
@@ -106,71 +99,73 @@ class DestinationListView(ListView):
             'selected_featured': self.request.GET.get('featured', ''),
             'sort_by': self.request.GET.get('sort', '-featured'),
         })
+        if self.filter.search:
+            _record_search(self.request, self.filter.search, context['facets']['total'])
         return context
 
 
 class DestinationDetailView(DetailView):
     """Detailed view of a single destination"""
+    use_read_replica = True
     model = Destination
     template_name = 'tourism/destination_detail.html'
     context_object_name = 'destination'
     
-    def get_queryset(self):
-        return Destination.objects.filter(
-            is_active=True
-        ).select_related('state').prefetch_related('categories', 'reviews__user')
+    def get_object(self, queryset=None):
+        self.snapshot = catalogue.snapshot()
+        destination = self.snapshot.by_slug.get(self.kwargs['slug'])
+        if destination is None:
+            raise Http404('No destination found matching the query')
+        trending.record(destination.id, 'view')
+        events.record('view', self.request.user, destination_id=destination.id)
+        return destination
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        destination = self.get_object()
+        destination = self.object
         
         # Get reviews with pagination
-        reviews = destination.reviews.select_related('user').order_by('-created_at')
+        reviews = Review.objects.filter(
+            destination_id=destination.id
+        ).select_related('user').order_by('-created_at')
         paginator = Paginator(reviews, 10)
         page_number = self.request.GET.get('page')
         page_reviews = paginator.get_page(page_number)
         
-        # Check if user has this in wishlist
-        in_wishlist = False
-        user_review = None
-        if self.request.user.is_authenticated:
-            in_wishlist = Wishlist.objects.filter(
-                user=self.request.user, destination=destination
-            ).exists()
-            try:
-                user_review = Review.objects.get(
-                    user=self.request.user, destination=destination
-                )
-            except Review.DoesNotExist:
-                pass
-        
-        # Similar destinations
-        similar_destinations = Destination.objects.filter(
-            categories__in=destination.categories.all(),
-            is_active=True
-        ).exclude(id=destination.id).distinct()[:4]
+        # The user's wishlist and review state for this page
+        state = user_state(self.request)
+        destination, *similar_destinations = state.annotate(
+            [destination, *self.snapshot.similar(destination)]
+        )
         
         context.update({
+            'destination': destination,
             'reviews': page_reviews,
-            'in_wishlist': in_wishlist,
-            'user_review': user_review,
+            'in_wishlist': destination.in_wishlist,
+            'user_review': destination.user_review,
             'review_form': ReviewForm(),
             'similar_destinations': similar_destinations,
         })
         return context
 
 
-class DestinationsByCategoryView(ListView):
+class DestinationsByCategoryView(UserStateMixin, CursorPaginationMixin, ListView):
     """Filter destinations by category"""
+    use_read_replica = True
     model = Destination
     template_name = 'tourism/destinations_by_category.html'
     context_object_name = 'destinations'
     paginate_by = 12
     
     def get_queryset(self):
-        self.category = get_object_or_404(Category, name=self.kwargs['category'])
-        return Destination.objects.filter(
-            categories=self.category, is_active=True
+        snapshot = catalogue.snapshot()
+        self.category = snapshot.categories_by_name.get(self.kwargs['category'])
+        if self.category is None:
+            raise Http404('No category found matching the query')
+        if self.cursor_query_param not in self.request.GET:
+            return snapshot.by_category.get(self.category.name, RecordList())
+        return DestinationFilter(category=self.category.name).apply(
+            Destination.objects.filter(is_active=True)
         ).select_related('state').prefetch_related('categories')
     
     def get_context_data(self, **kwargs):
@@ -179,17 +174,23 @@ class DestinationsByCategoryView(ListView):
         return context
 
 
-class DestinationsByStateView(ListView):
+class DestinationsByStateView(UserStateMixin, CursorPaginationMixin, ListView):
     """Filter destinations by state"""
+    use_read_replica = True
     model = Destination
     template_name = 'tourism/destinations_by_state.html'
     context_object_name = 'destinations'
     paginate_by = 12
     
     def get_queryset(self):
-        self.state = get_object_or_404(State, name=self.kwargs['state'])
+        snapshot = catalogue.snapshot()
+        self.state = snapshot.states_by_name.get(self.kwargs['state'])
+        if self.state is None:
+            raise Http404('No state found matching the query')
+        if self.cursor_query_param not in self.request.GET:
+            return snapshot.by_state.get(self.state.name, RecordList())
         return Destination.objects.filter(
-            state=self.state, is_active=True
+            state_id=self.state.id, is_active=True
         ).select_related('state').prefetch_related('categories')
     
     def get_context_data(self, **kwargs):
@@ -200,18 +201,18 @@ class DestinationsByStateView(ListView):
 
 class CategoriesView(TemplateView):
     """Show all tourism categories"""
+    use_read_replica = True
     template_name = 'tourism/categories.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.all().annotate(
-            destination_count=Count('destinations', filter=Q(destinations__is_active=True))
-        )
+        context['categories'] = catalogue.snapshot().categories
         return context
 
 
-class SearchView(ListView):
+class SearchView(UserStateMixin, CursorPaginationMixin, ListView):
     """Advanced search functionality"""
+    use_read_replica = True
     model = Destination
     template_name = 'tourism/search_results.html'
     context_object_name = 'destinations'
@@ -222,23 +223,27 @@ class SearchView(ListView):
         if not query:
             return Destination.objects.none()
         
-        return Destination.objects.filter(
-            Q(name__icontains=query) |
-            Q(city__icontains=query) |
-            Q(state__name__icontains=query) |
-            Q(description__icontains=query) |
-            Q(categories__name__icontains=query) |
-            Q(local_cuisine__icontains=query) |
-            Q(cultural_importance__icontains=query),
-            is_active=True
-        ).select_related('state').prefetch_related('categories').distinct()
+        search_filter = DestinationFilter(
+            search=query, search_fields=SITE_SEARCH_FIELDS, search_categories=True
+        )
+        return search_filter.apply(
+            Destination.objects.filter(is_active=True)
+        ).select_related('state').prefetch_related('categories')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['search_query'] = self.request.GET.get('q', '')
+        if context['search_query'].strip():
+            _record_search(self.request, context['search_query'].strip(), context['paginator'].count)
         return context
 
 
+def _record_search(request, query, results):
+    """Log a search once, on its first page"""
+    if request.GET.get('page', '1') == '1' and not request.GET.get('cursor'):
+        events.record('search', request.user, query=query[:200], results=results)
+
+
 # User-specific views
 class WishlistView(LoginRequiredMixin, ListView):
     """User's wishlist"""
@@ -267,32 +272,46 @@ class MyReviewsView(LoginRequiredMixin, ListView):
 
 
 # AJAX Views
+@require_POST
+def record_event(request):
+    """Beacon endpoint for analytics events raised in the browser"""
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Invalid JSON'}, status=400)
+    kind = data.get('kind')
+    if kind not in CLIENT_EVENTS:
+        return JsonResponse({'success': False, 'message': 'Unknown event'}, status=400)
+    field = CLIENT_EVENTS[kind]
+    value = str(data.get(field) or '').strip()[:200]
+    if not value:
+        return JsonResponse({'success': False, 'message': f'{field} is required'}, status=400)
+    events.record(kind, request.user, **{field: value})
+    return HttpResponse(status=204)
+
+
 @require_POST
 @login_required
 def toggle_wishlist(request):
     """Toggle destination in user's wishlist"""
     try:
         data = json.loads(request.body)
-        destination_id = data.get('destination_id')
-        destination = get_object_or_404(Destination, id=destination_id, is_active=True)
+        destination_id = int(data.get('destination_id'))
+        added = wishlist.toggle(request.user.pk, destination_id)
+        destination = catalogue.snapshot().by_id.get(destination_id)
+        name = destination.name if destination else 'destination'
         
-        wishlist_item, created = Wishlist.objects.get_or_create(
-            user=request.user,
-            destination=destination
-        )
-        
-        if created:
+        if added:
             return JsonResponse({
                 'success': True,
                 'added': True,
-                'message': f'Added {destination.name} to your wishlist!'
+                'message': f'Added {name} to your wishlist!'
             })
         else:
-            wishlist_item.delete()
             return JsonResponse({
                 'success': True,
                 'added': False,
-                'message': f'Removed {destination.name} from your wishlist!'
+                'message': f'Removed {name} from your wishlist!'
             })
     
     except Exception as e:
@@ -302,6 +321,29 @@ def toggle_wishlist(request):
         }, status=400)
 
 
+@require_POST
+@login_required
+def add_to_wishlist(request):
+    """Add several destinations to user's wishlist at once"""
+    try:
+        data = json.loads(request.body)
+        destination_ids = [int(destination_id) for destination_id in data.get('destination_ids', [])]
+    except (ValueError, TypeError):
+        return JsonResponse({'success': False, 'message': 'Invalid destination IDs'}, status=400)
+    if not destination_ids or len(destination_ids) > wishlist.BATCH_LIMIT:
+        return JsonResponse({
+            'success': False,
+            'message': f'Send between 1 and {wishlist.BATCH_LIMIT} destination IDs'
+        }, status=400)
+    
+    added = wishlist.add_many(request.user.pk, destination_ids)
+    return JsonResponse({
+        'success': True,
+        'added': added,
+        'message': f'Added {len(added)} destination{"s" if len(added) != 1 else ""} to your wishlist!'
+    })
+
+
 @require_POST
 @login_required
 def add_review(request):
@@ -336,7 +378,7 @@ def add_review(request):
         avg_rating = reviews.aggregate(avg=Avg('rating'))['avg']
         destination.average_rating = round(avg_rating, 2)
         destination.total_reviews = reviews.count()
-        destination.save()
+        destination.save(update_fields=['average_rating', 'total_reviews', 'updated_at'])
         
         return JsonResponse({
             'success': True,
@@ -351,23 +393,38 @@ def add_review(request):
         }, status=400)
 
 
+@memoize_on_request
+def _catalogue_snapshot(request):
+    """Snapshot answering the request, shared by the ETag and Last-Modified checks"""
+    return catalogue.snapshot()
+
+
+def _catalogue_version(request):
+    snapshot = _catalogue_snapshot(request)
+    # State/category edits don't touch destinations but do bump the version
+    return f'{snapshot.last_modified}|{len(snapshot)}|{snapshot.version}'
+
+
+def _catalogue_last_modified(request):
+    return _catalogue_snapshot(request).last_modified
+
+
+@read_replica
+@conditional_json(_catalogue_version, _catalogue_last_modified, public=True, max_age=60)
+def destination_facets(request):
+    """AJAX endpoint with live facet counts for the destination filters"""
+    return JsonResponse(compute_facets(DestinationFilter.from_params(request.GET)))
+
+
+@read_replica
+@conditional_json(_catalogue_version, _catalogue_last_modified, public=True, max_age=300)
 def search_suggestions(request):
     """AJAX endpoint for search suggestions"""
     query = request.GET.get('q', '').strip()
     suggestions = []
     
     if len(query) >= 2:
-        # Get destination suggestions
-        destinations = Destination.objects.filter(
-            Q(name__icontains=query) | Q(city__icontains=query),
-            is_active=True
-        ).values_list('name', flat=True)[:5]
-        
-        # Get state suggestions
-        states = State.objects.filter(
-            name__icontains=query
-        ).values_list('name', flat=True)[:3]
-        
+        destinations, states = _catalogue_snapshot(request).suggest(query)
         suggestions.extend([{'type': 'destination', 'name': name} for name in destinations])
         suggestions.extend([{'type': 'state', 'name': name} for name in states])
     
@@ -376,26 +433,88 @@ def search_suggestions(request):
 
 class InteractiveMapsView(TemplateView):
     """Interactive maps page with destinations and filters"""
+    use_read_replica = True
     template_name = 'tourism/maps.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Get all states with destinations
-        states = State.objects.annotate(
-            destination_count=Count('destination', filter=Q(destination__is_active=True))
-        ).filter(destination_count__gt=0).order_by('name')
-        
-        # Calculate statistics  
-        destinations = Destination.objects.filter(is_active=True)
-        total_destinations = destinations.count()
-        featured_destinations = destinations.filter(featured=True).count()
-        states_covered = states.count()
+        snapshot = catalogue.snapshot()
+        # States with destinations
+        states = [state for state in snapshot.states if state.destination_count]
         
+        events.record('map_open', self.request.user)
         context.update({
             'states': states,
-            'total_destinations': total_destinations,
-            'featured_destinations': featured_destinations,
-            'states_covered': states_covered,
+            'total_destinations': len(snapshot),
+            'featured_destinations': len(snapshot.featured),
+            'states_covered': len(states),
         })
         return context
+
+
+def _geojson_request(request):
+    """Parse bbox/zoom/filter parameters of the GeoJSON endpoint"""
+    bbox = request.GET.get('bbox', '-180,-85,180,85')
+    bbox = [float(value) for value in bbox.split(',')]
+    if len(bbox) != 4 or not all(math.isfinite(value) for value in bbox):
+        raise ValueError('bbox must be "min_lng,min_lat,max_lng,max_lat"')
+    zoom = float(request.GET.get('zoom', 0))
+    if not math.isfinite(zoom):
+        raise ValueError('zoom must be a number')
+    return bbox, zoom, map_clusters.get(DestinationFilter.from_params(request.GET))
+
+
+def _geojson_etag(request):
+    try:
+        bbox, zoom, clusters = _geojson_request(request)
+    except ValueError:
+        return None
+    key = f'{clusters.digest}|{bbox}|{int(zoom)}'
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+@read_replica
+@cache_control(public=True, max_age=60)
+@etag(_geojson_etag)
+def destinations_geojson(request):
+    """Clustered destination markers for a map viewport as GeoJSON"""
+    try:
+        bbox, zoom, clusters = _geojson_request(request)
+    except ValueError as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Invalid map parameters: {e}'
+        }, status=400)
+    
+    return JsonResponse({
+        'type': 'FeatureCollection',
+        'total': len(clusters.points),
+        'features': clusters.features(bbox, zoom),
+    })
+
+
+@memoize_on_request
+def _tile_clusters(request):
+    """Cluster index serving the request, shared by the ETag check and the tile"""
+    return tile_cache.clusters()
+
+
+def _tile_etag(request, z, x, y):
+    # Tiles are a function of the points on them and their coordinates
+    if z > MAX_TILE_ZOOM or x >= (1 << z) or y >= (1 << z):
+        return None
+    return f'{_tile_clusters(request).tile_fingerprint(z, x, y)}-{z}-{x}-{y}'
+
+
+@read_replica
+@cache_control(public=True, max_age=300)
+@etag(_tile_etag)
+def destination_tile(request, z, x, y):
+    """Mapbox Vector Tile of destinations for the z/x/y web map tile"""
+    if z > MAX_TILE_ZOOM or x >= (1 << z) or y >= (1 << z):
+        raise Http404('Tile out of range')
+    
+    return HttpResponse(
+        tile_cache.get(z, x, y, _tile_clusters(request)), content_type='application/vnd.mapbox-vector-tile'
+    )
@@ -0,0 +1,22 @@
+"""
+Startup warm-up of in-process catalogue structures.
+
+Called from the WSGI/ASGI entry points so the first requests of a worker
+don't pay for building them.
+"""
+import logging
+
+from django.db import DatabaseError
+
+logger = logging.getLogger(__name__)
+
+
+def warm_caches():
+    from .bitmap_index import destination_index
+
+    try:
+        # Builds the catalogue snapshot and the index derived from it
+        destination_index.warm()
+    except DatabaseError:
+        # Typically an unmigrated database; the catalogue builds lazily later.
+        logger.warning('Skipping catalogue warm-up', exc_info=True)
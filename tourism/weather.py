@@ -0,0 +1,153 @@
+"""
+Current weather from OpenWeather, cached in ``PlaceWeatherCache``.
+"""
+import asyncio
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import PlaceWeatherCache
+from .outbound import ASYNC_HTTP_ERRORS, RateLimitExceeded, aget_json, get_json, provider
+
+# Precision of PlaceWeatherCache coordinates
+COORDINATE_PLACES = Decimal('0.000001')
+
+
+class WeatherAPIError(Exception):
+    """OpenWeather answered with an error"""
+
+
+def weather_payload(cache_obj):
+    """Response fields for a cached weather row"""
+    return {
+        'temperature': cache_obj.temperature,
+        'description': cache_obj.description,
+        'humidity': cache_obj.humidity,
+        'wind_speed': cache_obj.wind_speed,
+        'icon': cache_obj.icon,
+    }
+
+
+def _request_params(latitude, longitude):
+    return {
+        'lat': latitude,
+        'lon': longitude,
+        'appid': settings.OPENWEATHER_API_KEY,
+        'units': 'metric',
+    }
+
+
+def _parse_response(status, data):
+    if status != 200:
+        raise WeatherAPIError('Weather data unavailable')
+
+    return {
+        'temperature': data['main']['temp'],
+        'description': data['weather'][0]['description'].title(),
+        'humidity': data['main']['humidity'],
+        'wind_speed': data['wind']['speed'],
+        'icon': data['weather'][0]['icon'],
+    }
+
+
+def _location(latitude, longitude):
+    return {'latitude': Decimal(str(latitude)), 'longitude': Decimal(str(longitude))}
+
+
+def fetch_current_weather(latitude, longitude):
+    """Request and format the current weather at a point"""
+    return _parse_response(*get_json(settings.OPENWEATHER_API_URL, _request_params(latitude, longitude)))
+
+
+async def afetch_current_weather(latitude, longitude):
+    return _parse_response(*await aget_json(settings.OPENWEATHER_API_URL, _request_params(latitude, longitude)))
+
+
+def store_weather(latitude, longitude, weather_data):
+    """Save weather for a point, replacing any cached row"""
+    location = _location(latitude, longitude)
+    updated = PlaceWeatherCache.objects.filter(**location).update(cached_at=timezone.now(), **weather_data)
+    if not updated:
+        PlaceWeatherCache.objects.create(**location, **weather_data)
+
+
+async def astore_weather(latitude, longitude, weather_data):
+    location = _location(latitude, longitude)
+    updated = await PlaceWeatherCache.objects.filter(**location).aupdate(cached_at=timezone.now(), **weather_data)
+    if not updated:
+        await PlaceWeatherCache.objects.acreate(**location, **weather_data)
+
+
+def refresh_weather(latitude, longitude):
+    """
+    Fetch and cache the weather at a point. Concurrent refreshes of the same
+    point share one upstream request; raises ``RateLimitExceeded`` when the
+    OpenWeather budget is spent.
+    """
+    def refresh():
+        weather_data = fetch_current_weather(latitude, longitude)
+        store_weather(latitude, longitude, weather_data)
+        return weather_data
+
+    return provider('openweather').call(('weather', latitude, longitude), refresh)
+
+
+async def arefresh_weather(latitude, longitude, max_wait=None):
+    async def refresh():
+        weather_data = await afetch_current_weather(latitude, longitude)
+        await astore_weather(latitude, longitude, weather_data)
+        return weather_data
+
+    return await provider('openweather').acall(('weather', latitude, longitude), refresh, max_wait)
+
+
+def _point_key(latitude, longitude):
+    return (
+        Decimal(str(latitude)).quantize(COORDINATE_PLACES),
+        Decimal(str(longitude)).quantize(COORDINATE_PLACES),
+    )
+
+
+async def acached_weather(keys):
+    """Newest cached row per ``_point_key``, read in one query"""
+    query = Q()
+    for latitude, longitude in keys:
+        query |= Q(latitude=latitude, longitude=longitude)
+    rows = {}
+    async for row in PlaceWeatherCache.objects.filter(query).order_by('cached_at'):
+        rows[_point_key(row.latitude, row.longitude)] = row
+    return rows
+
+
+async def aweather_for_points(points, concurrency=None, max_wait=None):
+    """
+    Weather for a list of ``(latitude, longitude)`` points, in order.
+
+    Fresh cache hits come from a single query; misses and expired rows are
+    refreshed concurrently, at most ``concurrency`` at a time, falling back
+    to the expired row when the refresh fails. ``max_wait`` is how long a
+    refresh may queue for OpenWeather budget. Each result has a
+    ``success`` flag and, for fallbacks, ``stale``.
+    """
+    keys = list(dict.fromkeys(_point_key(latitude, longitude) for latitude, longitude in points))
+    if not keys:
+        return []
+    rows = await acached_weather(keys)
+    semaphore = asyncio.Semaphore(concurrency or settings.WEATHER_BATCH_CONCURRENCY)
+
+    async def resolve(key):
+        row = rows.get(key)
+        if row is not None and row.is_fresh():
+            return {'success': True, **weather_payload(row)}
+        async with semaphore:
+            try:
+                return {'success': True, **await arefresh_weather(float(key[0]), float(key[1]), max_wait)}
+            except (WeatherAPIError, RateLimitExceeded, *ASYNC_HTTP_ERRORS) as e:
+                if row is not None:
+                    return {'success': True, 'stale': True, **weather_payload(row)}
+                return {'success': False, 'message': str(e) or 'Weather data unavailable'}
+
+    results = dict(zip(keys, await asyncio.gather(*(resolve(key) for key in keys))))
+    return [results[_point_key(latitude, longitude)] for latitude, longitude in points]
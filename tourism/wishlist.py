@@ -0,0 +1,134 @@
+"""
+Wishlist writes and the cached set of each user's wishlisted destinations.
+
+``toggle`` removes the (user, destination) row with one ``DELETE`` and,
+only when nothing was removed, adds it with one ``INSERT ... SELECT ...
+ON CONFLICT DO NOTHING`` that also checks the destination is active, so
+no read is needed first and concurrent clicks can't raise
+``IntegrityError``. ``add_many`` adds a batch with one such ``INSERT``
+whose ``RETURNING`` clause reports the rows it actually inserted.
+
+These writes send no model signals, so they report through
+``wishlist_changed``, which the model signal handlers use as well. It
+adjusts the user's stored wishlist count, marks their recommendations
+stale and invalidates their cached ID set, which listing pages read to
+fill in hearts without a query per card.
+
+The ID set lives in the shared cache (``CACHES``), so every worker sees an
+invalidation. Invalidating writes a short-lived marker rather than
+deleting the entry, and readers only ``add()`` a fresh set when the key is
+empty: a reader that loaded the set just before a write can't store it
+over the marker.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from accounts.models import UserProfile
+
+from .models import Destination, Wishlist
+from .recommendations import recommender
+from .trending import trending
+
+IDS_CACHE_KEY = 'tourism:wishlist:{user_id}'
+# Stored in place of a user's ID set after a change; while it lasts reads
+# go to the database and can't cache what they read
+INVALIDATED = 'invalidated'
+INVALIDATED_TIMEOUT = 10
+
+# Most destinations accepted by one ``add_many`` request
+BATCH_LIMIT = 100
+
+
+def wishlist_ids(user_id):
+    """Frozen set of destination IDs on a user's wishlist"""
+    key = IDS_CACHE_KEY.format(user_id=user_id)
+    cached = cache.get(key)
+    if isinstance(cached, frozenset):
+        return cached
+    ids = frozenset(Wishlist.objects.filter(user_id=user_id).values_list('destination_id', flat=True))
+    if cached is None:
+        cache.add(key, ids, settings.WISHLIST_CACHE_TIMEOUT)
+    return ids
+
+
+def wishlist_changed(user_id, added=(), removed=0):
+    """
+    Refresh what depends on a user's wishlist after ``added`` destination
+    IDs and ``removed`` rows
+    """
+    # After commit, so no reader can cache the set from before this change
+    transaction.on_commit(lambda: cache.set(
+        IDS_CACHE_KEY.format(user_id=user_id), INVALIDATED, INVALIDATED_TIMEOUT
+    ))
+    if len(added) != removed:
+        UserProfile.adjust_counters(user_id, wishlist_count=len(added) - removed)
+    recommender.invalidate(user_id)
+    for destination_id in added:
+        trending.record(destination_id, 'wishlist')
+
+
+def toggle(user_id, destination_id):
+    """
+    Add the destination to the user's wishlist, or remove it if present,
+    with a ``DELETE`` and, if that removed nothing, an ``INSERT``. Returns
+    whether the destination is now on the wishlist; raises
+    ``Destination.DoesNotExist`` for unknown or inactive destinations.
+    """
+    using = router.db_for_write(Wishlist)
+    connection = connections[using]
+    table = connection.ops.quote_name(Wishlist._meta.db_table)
+    destinations = connection.ops.quote_name(Destination._meta.db_table)
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE user_id = %s AND destination_id = %s',
+            [user_id, destination_id],
+        )
+        added = not cursor.rowcount
+        if added:
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, destination_id, created_at) '
+                f'SELECT %s, id, %s FROM {destinations} WHERE id = %s AND is_active '
+                f'ON CONFLICT (user_id, destination_id) DO NOTHING',
+                [user_id, connection.ops.adapt_datetimefield_value(timezone.now()), destination_id],
+            )
+            inserted = bool(cursor.rowcount)
+            # No row either means a concurrent toggle added it first or the
+            # destination can't be wishlisted
+            if not inserted and not Destination.objects.using(using).filter(
+                pk=destination_id, is_active=True
+            ).exists():
+                raise Destination.DoesNotExist(destination_id)
+    # Only report rows this call changed, so racing toggles count once
+    if not added:
+        wishlist_changed(user_id, removed=1)
+    elif inserted:
+        wishlist_changed(user_id, added=[destination_id])
+    return added
+
+
+def add_many(user_id, destination_ids):
+    """Add active destinations to a user's wishlist; returns the IDs newly added"""
+    destination_ids = list(dict.fromkeys(destination_ids))
+    if not destination_ids:
+        return []
+    using = router.db_for_write(Wishlist)
+    connection = connections[using]
+    table = connection.ops.quote_name(Wishlist._meta.db_table)
+    destinations = connection.ops.quote_name(Destination._meta.db_table)
+    with connection.cursor() as cursor:
+        # RETURNING lists only the rows this statement inserted, so
+        # concurrent batches never both count the same destination
+        cursor.execute(
+            f'INSERT INTO {table} (user_id, destination_id, created_at) '
+            f'SELECT %s, id, %s FROM {destinations} '
+            f'WHERE id IN ({", ".join(["%s"] * len(destination_ids))}) AND is_active '
+            f'ON CONFLICT (user_id, destination_id) DO NOTHING '
+            f'RETURNING destination_id',
+            [user_id, connection.ops.adapt_datetimefield_value(timezone.now()), *destination_ids],
+        )
+        added = sorted(destination_id for destination_id, in cursor.fetchall())
+    if added:
+        wishlist_changed(user_id, added=added)
+    return added